@@ -0,0 +1,69 @@
+# payload size and serialization time of the figures sent to the browser,
+# with the plain encoding (iso dates, full precision floats) against the
+# compact one, and of a cached response (what a repeat view costs).
+#   python benchmarks/bench_figures.py [years]
+import gzip
+import json
+import sys
+import timeit
+from os import path
+
+import dash
+import numpy as np
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+from builder import AppBuilder
+from figures import serialize_figure
+
+COLUMNS = ['global_active_power', 'sub_metering_1', 'sub_metering_2',
+           'sub_metering_3', 'not_sub_metering']
+VIEWS = [
+    ('main', dict(freq='1H')),
+    ('main', dict(freq='1D')),
+    ('all_data_by_season', dict(mode='group', freq='1D')),
+    ('yearly_data_by_season', dict(mode='group', freq='1D')),
+]
+
+def make_data(years):
+    index = pd.date_range('2006-12-16 17:00', periods=years * 365 * 24,
+                          freq='H')
+    return pd.DataFrame(np.random.rand(len(index), len(COLUMNS)) * 30,
+                        index=index, columns=COLUMNS)
+
+def best_of(f, repeat=3):
+    return min(timeit.repeat(f, number=1, repeat=repeat))
+
+def plain(builder, view, params):
+    builder.compact_figures = False
+    figure = getattr(builder, builder.figure_views[view][0])(**params)
+    return json.dumps(figure, cls=PlotlyJSONEncoder).encode('utf-8')
+
+def compact(builder, view, params):
+    builder.compact_figures = True
+    figure = getattr(builder, builder.figure_views[view][0])(**params)
+    return serialize_figure(figure)
+
+def main(years=4):
+    builder = AppBuilder(dash.Dash(__name__), make_data(years))
+    builder.precompute_resamples(background=False)
+    print('{:<32} {:>10} {:>10} {:>10} {:>10}'.format(
+        'figure', 'bytes', 'gzipped', 'time', 'cached'))
+    for view, params in VIEWS:
+        name = '{} {}'.format(view, ' '.join(sorted(params.values())))
+        for label, f in [('plain', plain), ('compact', compact)]:
+            body = f(builder, view, params)
+            seconds = best_of(lambda: f(builder, view, params))
+            cached = ''
+            if label == 'compact':
+                builder.figure_response(view, **params)
+                cached = '{:.6f}s'.format(best_of(
+                    lambda: builder.figure_response(view, **params)))
+            print('{:<32} {:>10} {:>10} {:>9.4f}s {:>10}'.format(
+                '{} ({})'.format(name, label), len(body),
+                len(gzip.compress(body)), seconds, cached))
+    builder.jobs.shutdown()
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,106 @@
+# memory per row of the data held by the app, as loaded (float64, derived
+# columns, copied by the builder) against data.lean_frame (float32, derived
+# columns computed when needed, not copied), and how much the resamples,
+# the season sums, the chart traces and the forecasts differ between both.
+#   python benchmarks/bench_memory.py [years]
+import sys
+from importlib.util import find_spec
+from os import path
+
+import dash
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+from builder import AppBuilder
+from cache import frame_size
+from data import derived_column, lean_frame
+import forecast
+
+FREQUENCIES = ['1H', '1D', '1W', '1M']
+
+def make_data(years, freq):
+    # readings with the resolution of the real ones: kilowatts to 3
+    # decimals, volts to 2, watt-hours as integers
+    index = pd.date_range('2006-12-16 17:24', periods=1, freq=freq)
+    index = pd.date_range(index[0], index[0] + pd.DateOffset(years=years),
+                          freq=freq)
+    n = len(index)
+    df = pd.DataFrame(dict(
+        global_active_power=np.round(np.random.gamma(2, .6, n), 3),
+        global_reactive_power=np.round(np.random.gamma(2, .06, n), 3),
+        voltage=np.round(np.random.normal(240, 3, n), 2),
+        global_intensity=np.round(np.random.gamma(2, 2.5, n), 1),
+        sub_metering_1=np.random.poisson(1, n).astype(np.float64),
+        sub_metering_2=np.random.poisson(1.3, n).astype(np.float64),
+        sub_metering_3=np.random.poisson(6, n).astype(np.float64),
+    ), index=index, columns=['global_active_power', 'global_reactive_power',
+                             'voltage', 'global_intensity', 'sub_metering_1',
+                             'sub_metering_2', 'sub_metering_3'])
+    df['global_apparent_power'] = derived_column(df, 'global_apparent_power')
+    df['not_sub_metering'] = (df.global_active_power * (1000 / 60) -
+                              df.sub_metering_1 - df.sub_metering_2 -
+                              df.sub_metering_3)
+    for c in ['total_sub_metering', 'total_sub_no_sub_metering']:
+        df[c] = derived_column(df, c)
+    return df
+
+def relative_error(a, b):
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    scale = np.nanmax(np.abs(b)) or 1.
+    return np.nanmax(np.abs(a - b)) / scale
+
+def memory(name, df):
+    full = AppBuilder(dash.Dash(__name__), df)
+    lean = AppBuilder(dash.Dash(__name__), lean_frame(df), copy_data=False)
+    # the builder's frame, plus the caller's one when it was copied
+    before = frame_size(df) + frame_size(full.frame())
+    after = frame_size(lean.frame())
+    print('{}: {} rows, {} columns -> {}'.format(
+        name, len(df), df.shape[1], lean.frame().shape[1]))
+    print('  {:.1f} bytes/row before, {:.1f} after ({:.0%})'.format(
+        before / len(df), after / len(df), after / before))
+    return full, lean
+
+def accuracy(full, lean):
+    print('  largest error, relative to the largest value')
+    for freq in FREQUENCIES:
+        a, b = lean.frame(freq), full.frame(freq)
+        print('  {:>22} {:.2e}'.format('resample ' + freq, max(
+            relative_error(a[c], b[c]) for c in lean.feature_cols)))
+    a, b = lean.season_table('1D'), full.season_table('1D')
+    print('  {:>22} {:.2e}'.format('season sums', max(
+        relative_error(a[c], b[c]) for c in lean.feature_cols)))
+    for freq in ['1H', '1D']:
+        traces = [(f.build_main_figure(freq)['data']) for f in (lean, full)]
+        same = np.mean([np.array_equal(np.asarray(t.y, dtype=float),
+                                       np.asarray(u.y, dtype=float))
+                        for t, u in zip(*traces)])
+        print('  {:>22} {:.2e} ({:.0%} of the traces identical)'.format(
+            'chart values ' + freq, max(relative_error(t.y, u.y)
+                                        for t, u in zip(*traces)), same))
+    a, b = lean.training_frame(), full.training_frame()
+    print('  {:>22} {:.2e}'.format('training series', max(
+        relative_error(a[c], b[c]) for c in a)))
+    if find_spec('pyramid') is None:
+        print('  {:>22} skipped, pyramid-arima not installed'.format(
+            'forecasts'))
+        return
+    print('  {:>22} {:.2e}'.format('forecast total', relative_error(
+        forecast.forecast(a['total'], m=1), forecast.forecast(b['total'],
+                                                             m=1))))
+
+def main(years=4):
+    for name, freq in [('hourly', 'H'), ('minute', 'T')]:
+        df = make_data(years, freq)
+        if freq == 'H':
+            # hourly means, as hourly.csv
+            df = df.resample('H').mean()
+        full, lean = memory(name, df)
+        accuracy(full, lean)
+        for builder in (full, lean):
+            builder.jobs.shutdown()
+        print('')
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,46 @@
+# compares Rollup.resample against DataFrame.resample on synthetic hourly and
+# minute data shaped like the household dataset.
+#   python benchmarks/bench_rollup.py [years]
+import sys
+import timeit
+from os import path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+from rollup import Rollup
+
+COLUMNS = ['global_active_power', 'global_reactive_power', 'voltage',
+           'global_intensity', 'sub_metering_1', 'sub_metering_2',
+           'sub_metering_3', 'not_sub_metering']
+RULES = ['1H', '6H', '1D', '3D', '1W', '2W', '1M', '3M']
+
+def make_data(freq, years):
+    index = pd.date_range('2006-12-16 17:24', periods=1, freq=freq)
+    index = pd.date_range(index[0], index[0] + pd.DateOffset(years=years),
+                          freq=freq)
+    return pd.DataFrame(np.random.rand(len(index), len(COLUMNS)),
+                        index=index, columns=COLUMNS)
+
+def best_of(f, repeat=3):
+    return min(timeit.repeat(f, number=1, repeat=repeat))
+
+def main(years=4):
+    for name, freq in [('hourly', 'H'), ('minute', 'T')]:
+        df = make_data(freq, years)
+        build = best_of(lambda: Rollup(df), repeat=1)
+        rollup = Rollup(df)
+        print('{} data: {} rows, rollup built in {:.3f}s'.format(
+            name, len(df), build))
+        print('{:>6} {:>12} {:>12} {:>8}'.format(
+            'rule', 'resample', 'rollup', 'speedup'))
+        for rule in RULES:
+            plain = best_of(lambda: df.resample(rule).mean())
+            rolled = best_of(lambda: rollup.resample(rule))
+            print('{:>6} {:>11.4f}s {:>11.4f}s {:>7.1f}x'.format(
+                rule, plain, rolled, plain / rolled))
+        print('')
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,115 @@
+# time from starting a server process to its first responses, loading the
+# data when built (as main.build does by default) and lazily (in the
+# background, see AppBuilder.load), from the csv and from a store: the
+# layout, /ready and the first chart. every server reads its own data
+# directory, with years of synthetic hourly readings.
+#   python benchmarks/bench_startup.py [years] [runs]
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from os import path
+
+import numpy as np
+import pandas as pd
+
+SRC_PATH = path.join(path.dirname(path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_PATH)
+from data import PARSED_DATA_FILE, STORE_EXT, write_store
+
+COLUMNS = ['global_active_power', 'sub_metering_1', 'sub_metering_2',
+           'sub_metering_3', 'not_sub_metering']
+# the server: prints whether the forecasting stack was imported, then serves
+SERVER = '''
+import sys
+sys.path.insert(0, sys.argv[1])
+from main import build
+builder = build(env='prod', lazy=sys.argv[3] == 'lazy').setup()
+print('pyramid' in sys.modules, flush=True)
+builder.app.server.run(port=int(sys.argv[2]), threaded=True)
+'''
+# the first request of the main chart, hourly (outputs and changedPropIds are
+# for newer dash versions)
+MAIN_CHART = dict(
+    output='main-tab-content.children',
+    outputs=dict(id='main-tab-content', property='children'),
+    changedPropIds=['current-frequency.children'],
+    inputs=[dict(id='current-frequency', property='children', value='1H'),
+            dict(id='household', property='value', value=None)])
+
+def make_data(years, data_path, store):
+    index = pd.date_range('2006-12-16 17:00', periods=years * 365 * 24,
+                          freq='H', name='Date_Time')
+    df = pd.DataFrame(np.random.rand(len(index), len(COLUMNS)),
+                      index=index, columns=COLUMNS)
+    csv_path = path.join(data_path, PARSED_DATA_FILE)
+    df.to_csv(csv_path)
+    if store:
+        write_store(df, path.join(data_path, path.splitext(
+            PARSED_DATA_FILE)[0] + STORE_EXT), source_path=csv_path)
+
+def free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def wait_for(url, start, body=None, timeout=120):
+    # seconds since start to the first 200 of url
+    from urllib.error import URLError
+    from urllib.request import Request, urlopen
+    while time.time() - start < timeout:
+        try:
+            request = Request(url, data=body and json.dumps(body).encode(),
+                              headers={'Content-Type': 'application/json'})
+            if urlopen(request).status == 200:
+                return time.time() - start
+        except (URLError, ConnectionError):
+            time.sleep(.005)
+    raise RuntimeError('no response from {}'.format(url))
+
+def start_server(data_path, mode):
+    port = free_port()
+    url = 'http://127.0.0.1:{}'.format(port)
+    env = dict(os.environ, ELECTRICITY_APP_DATA=data_path)
+    start = time.time()
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVER, SRC_PATH, str(port), mode], env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        universal_newlines=True)
+    try:
+        layout = wait_for(url + '/_dash-layout', start)
+        ready = wait_for(url + '/ready', start)
+        chart = wait_for(url + '/_dash-update-component', start, MAIN_CHART)
+        forecasting = process.stdout.readline().strip() == 'True'
+    finally:
+        process.terminate()
+        process.wait()
+    return layout, ready, chart, forecasting
+
+def main(years=4, runs=3):
+    print('{:>6} {:>6} {:>10} {:>10} {:>12} {:>12}'.format(
+        'data', 'mode', 'layout', 'ready', 'first chart', 'forecasting'))
+    for source in ['csv', 'store']:
+        data_path = tempfile.mkdtemp()
+        try:
+            make_data(years, data_path, source == 'store')
+            for mode in ['eager', 'lazy']:
+                times = [start_server(data_path, mode) for _ in range(runs)]
+                layout, ready, chart = np.median(
+                    [t[:3] for t in times], axis=0)
+                print(('{:>6} {:>6} {:>8.0f}ms {:>8.0f}ms {:>10.0f}ms '
+                       '{:>12}').format(
+                           source, mode, layout * 1000, ready * 1000,
+                           chart * 1000,
+                           'imported' if times[0][3] else 'deferred'))
+        finally:
+            shutil.rmtree(data_path)
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
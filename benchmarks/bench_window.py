@@ -0,0 +1,56 @@
+# time of a zoom of the main chart on minute data: the window query alone
+# and the whole figure (query, downsample and traces), for random windows of
+# a few lengths, at a few session frequencies.
+#   python benchmarks/bench_window.py [years]
+import sys
+import time
+from os import path
+
+import dash
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+from builder import AppBuilder
+
+COLUMNS = ['sub_metering_1', 'sub_metering_2', 'sub_metering_3',
+           'not_sub_metering']
+FREQUENCIES = ['1H', '1D', '1M']
+WINDOWS = ['1D', '7D', '30D', '365D']
+ZOOMS = 20
+
+def make_data(years):
+    index = pd.date_range('2006-12-16 17:24', periods=years * 365 * 24 * 60,
+                          freq='T')
+    return pd.DataFrame(np.random.rand(len(index), len(COLUMNS)),
+                        index=index, columns=COLUMNS)
+
+def main(years=4):
+    df = make_data(years)
+    start = time.time()
+    builder = AppBuilder(dash.Dash(__name__), df)
+    builder.precompute_resamples(background=False)
+    print('{} minute rows, rollup and resamples in {:.1f}s'.format(
+        len(df), time.time() - start))
+    print('{:>6} {:>6} {:>10} {:>12} {:>12}'.format(
+        'freq', 'window', 'resolution', 'query', 'figure'))
+    starts = np.random.randint(0, len(df) - 365 * 24 * 60, ZOOMS)
+    for freq in FREQUENCIES:
+        builder.build_main_figure(freq)
+        for length in WINDOWS:
+            windows = [(df.index[i], df.index[i] + pd.Timedelta(length))
+                       for i in starts]
+            t0 = time.time()
+            resolutions = [builder.window_index(freq).query(
+                s, e, builder.window_max_rows)[0] for s, e in windows]
+            t1 = time.time()
+            for window in windows:
+                builder.build_main_figure(freq, window)
+            t2 = time.time()
+            print('{:>6} {:>6} {:>10} {:>10.2f}ms {:>10.2f}ms'.format(
+                freq, length, str(resolutions[0]),
+                (t1 - t0) / ZOOMS * 1000, (t2 - t1) / ZOOMS * 1000))
+    builder.jobs.shutdown()
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,62 @@
+# simulates concurrent sessions, each one with its own frequency, going
+# through the same AppBuilder methods as the callbacks. checks that every
+# session gets the charts of its own frequency and reports the memory traced
+# after every round (it should stay flat once the cache is warm)
+#   python benchmarks/load_sessions.py [sessions] [rounds]
+import sys
+import threading
+import tracemalloc
+from os import path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+from builder import AppBuilder
+
+FREQUENCIES = ['1H', '6H', '1D', '3D', '1W', '2W', '1M', '3M']
+COLUMNS = ['sub_metering_1', 'sub_metering_2', 'sub_metering_3',
+           'not_sub_metering']
+
+def make_data(years=4):
+    index = pd.date_range('2006-12-16 17:00', periods=years * 365 * 24,
+                          freq='H')
+    return pd.DataFrame(np.random.rand(len(index), len(COLUMNS)),
+                        index=index, columns=COLUMNS)
+
+def session(builder, freq, expected, errors):
+    df = builder.frame(freq)
+    builder.build_chart_all_meters(df)
+    for option in builder.season_charts:
+        getattr(builder, builder.season_charts[option])('group', freq)
+    sums = builder.group_by_year_and_season(df).sum()
+    if not (sums.index.equals(expected[freq].index) and
+            np.allclose(sums.values, expected[freq].values)):
+        errors.append(freq)
+
+def main(sessions=32, rounds=5):
+    df = make_data()
+    builder = AppBuilder(None, df)
+    expected = dict(
+        (f, builder.group_by_year_and_season(df.resample(f).mean()).sum())
+        for f in FREQUENCIES)
+    tracemalloc.start()
+    for i in range(rounds):
+        errors = []
+        threads = [threading.Thread(
+            target=session,
+            args=(builder, FREQUENCIES[s % len(FREQUENCIES)], expected,
+                  errors))
+            for s in range(sessions)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        current, peak = tracemalloc.get_traced_memory()
+        print('round {}: {} sessions, {} wrong, {:.1f}MB traced '
+              '(peak {:.1f}MB)'.format(i + 1, sessions, len(errors),
+                                       current / 1024 ** 2,
+                                       peak / 1024 ** 2))
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
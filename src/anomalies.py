@@ -0,0 +1,279 @@
+#!/usr/bin/python
+# consumption spikes and abnormal baseloads of the sub-meters, found in one
+# pass over chunks of the readings, so memory is bounded by the chunk size
+# (plus a summary by season and hour of the day) whatever the length of the
+# data:
+#
+#   spike: a reading above the median of the window readings before it by
+#       more than spike_threshold robust deviations. the deviation is 1.4826
+#       times the median of the absolute deviations of those readings from
+#       their own median (rolling, so it follows the level), at least
+#       min_scale
+#   baseload: an hour whose lowest reading (the standby consumption) is more
+#       than baseload_threshold robust deviations away from the usual one
+#       for that hour of the day in that season (see seasons.py), i.e. from
+#       the median of the baseline_days lowest readings of that hour before
+#       it in that season
+#
+#   python src/anomalies.py [--raw] [--out anomalies.csv]
+# reads the loaded data (hourly.csv, or its store), or full_data.csv with
+# --raw, a chunk at a time, and writes the anomalies found as csv
+import argparse
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from data import RAW_CHUNK_SIZE, iter_raw_data, load_data
+from seasons import SEASONS, season_codes
+
+SPIKE = 'spike'
+BASELOAD = 'baseload'
+ANOMALY_KINDS = [SPIKE, BASELOAD]
+ANOMALY_COLUMNS = ['kind', 'column', 'value', 'expected', 'score']
+# the MAD of normally distributed values times this is their standard
+# deviation
+MAD_SCALE = 1.4826
+DEFAULT_WINDOW = 60
+DEFAULT_SPIKE_THRESHOLD = 6.
+DEFAULT_BASELOAD_THRESHOLD = 4.
+DEFAULT_MIN_SCALE = 1.
+# days of history of an hour of the day kept, and needed before it's scored
+DEFAULT_BASELINE_DAYS = 60
+DEFAULT_MIN_BASELINE_DAYS = 7
+HOURS = 24
+# the columns looked at by default
+SUB_METERING_COLS = ['sub_metering_1', 'sub_metering_2', 'sub_metering_3',
+                     'not_sub_metering']
+
+def frame_chunks(df, chunksize=RAW_CHUNK_SIZE):
+    # slices (views) of df, i.e. of a memory mapped store
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+def anomaly_frame(kind, values, expected, score, flagged):
+    # one row per flagged cell of the (aligned) frames, indexed by time
+    rows, cols = np.nonzero(flagged.values)
+    return pd.DataFrame(dict(
+        kind=pd.Categorical([kind] * len(rows), categories=ANOMALY_KINDS),
+        column=pd.Categorical(np.asarray(values.columns)[cols],
+                              categories=list(values.columns)),
+        value=values.values[rows, cols],
+        expected=expected.values[rows, cols],
+        score=score.values[rows, cols],
+    ), index=values.index[rows], columns=ANOMALY_COLUMNS)
+
+def empty_anomalies(columns=()):
+    return anomaly_frame(SPIKE, pd.DataFrame(columns=list(columns)),
+                         pd.DataFrame(columns=list(columns)),
+                         pd.DataFrame(columns=list(columns)),
+                         pd.DataFrame(columns=list(columns), dtype=bool))
+
+def rolling_spikes(df, window=DEFAULT_WINDOW,
+                   threshold=DEFAULT_SPIKE_THRESHOLD,
+                   min_scale=DEFAULT_MIN_SCALE):
+    # the spikes of every column of df. the statistics of a row only use the
+    # rows before it (so a spike doesn't raise its own baseline), which are
+    # all there from the 2 * window th row on
+    min_periods = max(window // 2, 1)
+    level = df.rolling(window, min_periods=min_periods).median().shift(1)
+    deviation = df - level
+    scale = (MAD_SCALE * deviation.abs().rolling(
+        window, min_periods=min_periods).median().shift(1)).clip(
+            lower=min_scale)
+    score = deviation / scale
+    return anomaly_frame(SPIKE, df, level, score,
+                         (score > threshold).fillna(False))
+
+class HourlyBaseline(object):
+    # the lowest reading of the last `days` hours of every (season, hour of
+    # the day), by column, in a (seasons, 24, days, columns) ring buffer: the
+    # usual baseload of an hour is their median and its deviation 1.4826
+    # times their MAD. each day is scored against the days before it, so the
+    # state doesn't grow with the data and chunks give the same result
+    def __init__(self, seasons, columns, days=DEFAULT_BASELINE_DAYS,
+                 min_days=DEFAULT_MIN_BASELINE_DAYS):
+        self.seasons = seasons
+        self.columns = list(columns)
+        self.days = days
+        self.min_days = min_days
+        self.history = np.full((len(seasons), HOURS, days, len(columns)),
+                               np.nan)
+        self.counts = np.zeros((len(seasons), HOURS), dtype=np.int64)
+
+    def score(self, minima, min_scale=DEFAULT_MIN_SCALE, commit=True):
+        # minima: the lowest reading of complete hours, in order, after the
+        # ones scored before. returns the expected values and scales (NaN
+        # until min_days of history), and adds minima to the history unless
+        # commit is False
+        values = np.asarray(minima[self.columns].values, dtype=np.float64)
+        expected = np.full(values.shape, np.nan)
+        scale = np.full(values.shape, np.nan)
+        if not len(values):
+            return expected, scale
+        history, counts = self.history, self.counts
+        if not commit:
+            history, counts = history.copy(), counts.copy()
+        codes = season_codes(minima.index, self.seasons)
+        hours = np.asarray(minima.index.hour)
+        days = np.asarray(minima.index.normalize().asi8)
+        # the hours of a day are different cells, so a day at a time
+        for rows in np.split(np.arange(len(values)),
+                             np.flatnonzero(np.diff(days)) + 1):
+            s, h = codes[rows], hours[rows]
+            past = history[s, h]
+            with warnings.catch_warnings():
+                # all NaN cells, i.e. no history yet
+                warnings.simplefilter('ignore', RuntimeWarning)
+                median = np.nanmedian(past, axis=1)
+                mad = np.nanmedian(np.abs(past - median[:, None]), axis=1)
+            enough = (counts[s, h] >= self.min_days)[:, None]
+            expected[rows] = np.where(enough, median, np.nan)
+            scale[rows] = np.where(enough, np.maximum(MAD_SCALE * mad,
+                                                      min_scale), np.nan)
+            # hours without any reading don't take a day of history
+            valid = ~np.isnan(values[rows]).all(axis=1)
+            s, h = s[valid], h[valid]
+            history[s, h, counts[s, h] % self.days] = values[rows][valid]
+            counts[s, h] += 1
+        return expected, scale
+
+def baseload_frame(minima, expected, scale,
+                   threshold=DEFAULT_BASELOAD_THRESHOLD):
+    score = (minima.values - expected) / scale
+    with np.errstate(invalid='ignore'):
+        flagged = np.abs(score) > threshold
+    return anomaly_frame(
+        BASELOAD, minima,
+        pd.DataFrame(expected, minima.index, minima.columns),
+        pd.DataFrame(score, minima.index, minima.columns),
+        pd.DataFrame(flagged, minima.index, minima.columns))
+
+def hourly_baseloads(minima, seasons, threshold=DEFAULT_BASELOAD_THRESHOLD,
+                     min_scale=DEFAULT_MIN_SCALE,
+                     days=DEFAULT_BASELINE_DAYS,
+                     min_days=DEFAULT_MIN_BASELINE_DAYS):
+    # minima: the lowest reading of every hour, see HourlyBaseline
+    baseline = HourlyBaseline(seasons, minima.columns, days, min_days)
+    expected, scale = baseline.score(minima, min_scale)
+    return baseload_frame(minima, expected, scale, threshold)
+
+class AnomalyDetector(object):
+    # streaming version of rolling_spikes and hourly_baseloads: chunks (in
+    # order, not overlapping) are passed to update, and anomalies() has the
+    # anomalies of all of them. only the last 2 * window rows, the minimum
+    # of the last hour (which may go on in the next chunk) and the baseline
+    # are kept between chunks; the anomalies are the same as those of the
+    # whole data at once
+    def __init__(self, seasons, columns=None, window=DEFAULT_WINDOW,
+                 spike_threshold=DEFAULT_SPIKE_THRESHOLD,
+                 baseload_threshold=DEFAULT_BASELOAD_THRESHOLD,
+                 min_scale=DEFAULT_MIN_SCALE,
+                 baseline_days=DEFAULT_BASELINE_DAYS,
+                 min_baseline_days=DEFAULT_MIN_BASELINE_DAYS):
+        self.seasons = seasons
+        self.columns = columns or SUB_METERING_COLS
+        self.window = window
+        self.spike_threshold = spike_threshold
+        self.baseload_threshold = baseload_threshold
+        self.min_scale = min_scale
+        self.rows = 0
+        self._tail = None
+        self._spikes = []
+        self._baseline = HourlyBaseline(seasons, self.columns, baseline_days,
+                                        min_baseline_days)
+        self._hour = None
+        self._baseloads = []
+
+    def update(self, chunk):
+        chunk = chunk[self.columns].astype(np.float64)
+        if not len(chunk):
+            return
+        if not chunk.index.is_monotonic_increasing or (
+                self._tail is not None and
+                chunk.index[0] <= self._tail.index[-1]):
+            raise ValueError('chunks must be in time order and not overlap, '
+                             'got {} after {}'.format(
+                                 chunk.index[0], self._tail.index[-1]
+                                 if self._tail is not None else None))
+        history = chunk if self._tail is None else pd.concat(
+            [self._tail, chunk])
+        spikes = rolling_spikes(history, self.window, self.spike_threshold,
+                                self.min_scale)
+        # the ones of the rows kept from the last chunk were found then
+        if self._tail is not None:
+            spikes = spikes[spikes.index > self._tail.index[-1]]
+        self._spikes.append(spikes)
+        self._tail = history.iloc[-2 * self.window:]
+        minima = self._hourly_minima(chunk)
+        # the last hour may go on in the next chunk
+        self._hour = minima.iloc[-1:]
+        self._score(minima.iloc[:-1])
+        self.rows += len(chunk)
+
+    def _hourly_minima(self, chunk):
+        minima = chunk.resample('H').min()
+        if self._hour is None:
+            return minima
+        if minima.index[0] == self._hour.index[0]:
+            minima.iloc[0] = np.fmin(minima.values[0], self._hour.values[0])
+            return minima
+        return pd.concat([self._hour, minima])
+
+    def _score(self, minima, commit=True):
+        expected, scale = self._baseline.score(minima, self.min_scale, commit)
+        self._baseloads.append(baseload_frame(minima, expected, scale,
+                                              self.baseload_threshold))
+
+    def anomalies(self):
+        # spikes and baseloads, by time
+        if not self.rows:
+            return empty_anomalies(self.columns)
+        spikes = pd.concat(self._spikes)
+        # the last hour, without adding it to the baseline: more chunks may
+        # follow
+        baseloads = pd.concat(self._baseloads + [baseload_frame(
+            self._hour, *self._baseline.score(self._hour, self.min_scale,
+                                              commit=False),
+            threshold=self.baseload_threshold)])
+        # an hour whose lowest reading is a spike (i.e. its only one, with
+        # hourly data) is that spike
+        keys = pd.MultiIndex.from_arrays(
+            [spikes.index.floor('H'), spikes.column.astype(str),
+             spikes.value])
+        baseloads = baseloads[~pd.MultiIndex.from_arrays(
+            [baseloads.index, baseloads.column.astype(str),
+             baseloads.value]).isin(keys)]
+        df = pd.concat([spikes, baseloads])
+        return df.iloc[np.argsort(df.index.values, kind='mergesort')]
+
+def detect_anomalies(chunks, seasons, columns=None, **kwargs):
+    # anomalies of an iterable of chunks, see AnomalyDetector
+    detector = AnomalyDetector(seasons, columns, **kwargs)
+    for chunk in chunks:
+        detector.update(chunk)
+    return detector.anomalies()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Find spikes and abnormal baseloads of the sub-meters')
+    parser.add_argument('--raw', action='store_true',
+                        help='read full_data.csv instead of the loaded data')
+    parser.add_argument('--chunksize', type=int, default=RAW_CHUNK_SIZE)
+    parser.add_argument('--window', type=int, default=DEFAULT_WINDOW)
+    parser.add_argument('--spike-threshold', type=float,
+                        default=DEFAULT_SPIKE_THRESHOLD)
+    parser.add_argument('--baseload-threshold', type=float,
+                        default=DEFAULT_BASELOAD_THRESHOLD)
+    parser.add_argument('--out', help='csv file (stdout if not given)')
+    args = parser.parse_args(argv)
+    chunks = (iter_raw_data(args.chunksize, derived=False) if args.raw
+              else frame_chunks(load_data(), args.chunksize))
+    df = detect_anomalies(chunks, SEASONS, window=args.window,
+                          spike_threshold=args.spike_threshold,
+                          baseload_threshold=args.baseload_threshold)
+    df.to_csv(args.out or sys.stdout)
+
+if __name__ == '__main__':
+    main()
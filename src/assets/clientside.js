@@ -0,0 +1,14 @@
+// callbacks run in the browser (see AppBuilder.add_seasonal_content_callback)
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    seasonal: {
+        // the bar mode is layout only: the figure already in the page is
+        // updated instead of asking the server for a new one
+        barmode: function(mode, figure) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            var layout = Object.assign({}, figure.layout, {barmode: mode});
+            return Object.assign({}, figure, {layout: layout});
+        }
+    }
+});
@@ -0,0 +1,225 @@
+#!/usr/bin/python
+# rolling origin backtest of the auto arima configurations, on the monthly
+# series the app fits (see AppBuilder.training_frame). every configuration of
+# a grid is fitted on growing windows of the series and scored on the months
+# following each one; the report (json) has the fit time, the growth of the
+# peak memory of the process, the errors and the order chosen for every
+# fold, and a summary per configuration.
+#   python src/backtest.py --grid m=1,12 --grid max_p=2,5 --out report.json
+import argparse
+import itertools
+import json
+import sys
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+try:
+    import resource
+except ImportError:
+    # not on windows, no memory figures
+    resource = None
+
+from data import load_data
+from forecast import run_auto_arima, training_frame
+from model_cache import ModelCache, model_key
+
+SERIES_COLUMNS = ['sub_metering_1', 'sub_metering_2', 'sub_metering_3',
+                  'not_sub_metering']
+DEFAULT_GRID = OrderedDict([
+    ('m', [1, 12]),
+    ('max_p', [2, 5]),
+])
+DEFAULT_HORIZON = 12
+DEFAULT_MIN_TRAIN = 24
+# full order searches are only done every this many folds, the folds in
+# between refit the order found on their longer window
+DEFAULT_SEARCH_EVERY = 6
+
+def param_grid(grid):
+    names = list(grid)
+    return [OrderedDict(zip(names, values))
+            for values in itertools.product(*[grid[n] for n in names])]
+
+def fold_origins(n_obs, horizon, min_train, step=1):
+    # sizes of the training windows, so every fold has horizon months to be
+    # scored on
+    return list(range(min_train, n_obs - horizon + 1, step))
+
+def segments(origins, search_every):
+    # folds sharing a search: the first one searches the order, the others
+    # reuse it. segments are independent, so they run in parallel
+    search_every = max(search_every, 1)
+    return [origins[i:i + search_every]
+            for i in range(0, len(origins), search_every)]
+
+def errors(actual, predicted):
+    actual = np.asarray(actual, dtype=np.float64)
+    error = np.abs(actual - np.asarray(predicted, dtype=np.float64))
+    nonzero = actual != 0
+    mape = (np.mean(error[nonzero] / np.abs(actual[nonzero])) * 100
+            if nonzero.any() else None)
+    return float(np.mean(error)), None if mape is None else float(mape)
+
+def _max_rss():
+    # peak resident memory of the process so far, in bytes (kilobytes on
+    # linux, bytes on macos)
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def _fit(f):
+    # runs f, returns its result, the seconds it took and how much it raised
+    # the peak memory of the process (0 when it stayed under an earlier
+    # peak). nothing hooks the allocations, so the time is the fit's own.
+    # whatever the fit prints goes to stderr, so it can't get mixed with a
+    # report written to stdout
+    before = _max_rss()
+    start = time.time()
+    with redirect_stdout(sys.stderr):
+        result = f()
+    seconds = time.time() - start
+    growth = None if before is None else _max_rss() - before
+    return result, seconds, growth
+
+def run_segment(y, params, origins, horizon, cache=None):
+    # the folds of one segment, in order: a search on the first window (or
+    # its model from the cache), then the same model updated with the new
+    # observations of every following window
+    folds = []
+    model = None
+    for i, size in enumerate(origins):
+        train = y.iloc[:size]
+        cached = False
+        if model is None:
+            key = model_key(train, params, horizon)
+            entry = None if cache is None else cache.get(key)
+            if entry is not None:
+                model, seconds, growth, cached = (entry['model'], 0., 0,
+                                                  True)
+            else:
+                model, seconds, growth = _fit(
+                    lambda: run_auto_arima(train, **params))
+                if cache is not None:
+                    cache.put(key, model,
+                              model.predict(n_periods=horizon))
+            searched = True
+        else:
+            new = y.iloc[origins[i - 1]:size]
+            _, seconds, growth = _fit(lambda: model.add_new_observations(new))
+            searched = False
+        predicted = model.predict(n_periods=horizon)
+        mae, mape = errors(y.iloc[size:size + horizon], predicted)
+        folds.append(dict(
+            train_size=size,
+            origin=str(y.index[size - 1]),
+            searched=searched,
+            cached=cached,
+            fit_seconds=seconds,
+            rss_growth_bytes=growth,
+            order=list(getattr(model, 'order', None) or []),
+            seasonal_order=list(getattr(model, 'seasonal_order', None)
+                                or []),
+            mae=mae,
+            mape=mape))
+    return folds
+
+def summarize(folds):
+    def mean(values):
+        values = [v for v in values if v is not None]
+        return float(np.mean(values)) if values else None
+    # searches answered by the cache didn't cost anything, leave them out
+    searches = [d['fit_seconds'] for d in folds
+                if d['searched'] and not d['cached']]
+    updates = [d['fit_seconds'] for d in folds if not d['searched']]
+    return OrderedDict([
+        ('folds', len(folds)),
+        ('mae', mean([d['mae'] for d in folds])),
+        ('mape', mean([d['mape'] for d in folds])),
+        ('search_seconds_mean', mean(searches)),
+        ('search_seconds_max', max(searches) if searches else None),
+        ('update_seconds_mean', mean(updates)),
+        ('rss_growth_bytes_max', max(d['rss_growth_bytes'] or 0
+                                     for d in folds)),
+        ('orders', Counter(
+            '{} {}'.format(tuple(d['order']), tuple(d['seasonal_order']))
+            for d in folds).most_common()),
+    ])
+
+def backtest(y, grid=DEFAULT_GRID, horizon=DEFAULT_HORIZON,
+             min_train=DEFAULT_MIN_TRAIN, search_every=DEFAULT_SEARCH_EVERY,
+             max_workers=None, cache=None):
+    y = y.dropna()
+    origins = fold_origins(len(y), horizon, min_train)
+    configs = param_grid(grid)
+    with ProcessPoolExecutor(max_workers) as executor:
+        futures = [[executor.submit(run_segment, y, params, s, horizon,
+                                    cache)
+                    for s in segments(origins, search_every)]
+                   for params in configs]
+        results = []
+        for params, segment_futures in zip(configs, futures):
+            folds = [d for f in segment_futures for d in f.result()]
+            results.append(OrderedDict([
+                ('params', params),
+                ('summary', summarize(folds)),
+                ('folds', folds),
+            ]))
+    results.sort(key=lambda r: (r['summary']['mae'] is None,
+                                r['summary']['mae']))
+    return OrderedDict([
+        ('series', y.name),
+        ('observations', len(y)),
+        ('start', str(y.index[0])),
+        ('end', str(y.index[-1])),
+        ('horizon', horizon),
+        ('min_train', min_train),
+        ('search_every', search_every),
+        ('configs', results),
+    ])
+
+def parse_grid(items):
+    grid = OrderedDict()
+    for item in items:
+        name, values = item.split('=', 1)
+        grid[name] = [None if v == 'None' else json.loads(v)
+                      for v in values.split(',')]
+    return grid
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Rolling origin backtest of auto arima parameters')
+    parser.add_argument('--series', default='total',
+                        choices=SERIES_COLUMNS + ['total'])
+    parser.add_argument('--grid', action='append', metavar='NAME=V1,V2',
+                        help=('values of an auto_arima parameter, repeat for '
+                              'more parameters (default: {})'.format(
+                                  ' '.join('{}={}'.format(
+                                      n, ','.join(map(str, v)))
+                                      for n, v in DEFAULT_GRID.items()))))
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON)
+    parser.add_argument('--min-train', type=int, default=DEFAULT_MIN_TRAIN)
+    parser.add_argument('--search-every', type=int,
+                        default=DEFAULT_SEARCH_EVERY)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse (and store) searches in the model cache')
+    parser.add_argument('--out', help='report file (default: stdout)')
+    args = parser.parse_args(argv)
+    y = training_frame(
+        load_data()[SERIES_COLUMNS].resample('1M').mean())[args.series]
+    report = backtest(
+        y, parse_grid(args.grid) if args.grid else DEFAULT_GRID,
+        args.horizon, args.min_train, args.search_every, args.workers,
+        ModelCache() if args.cache else None)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -2,17 +2,65 @@ import dash_table
 import dash_core_components as dcc
 import dash_html_components as html
 from dash.dependencies import Input, Output, State
+try:
+    from dash.dependencies import ClientsideFunction
+except ImportError:
+    # dash < 0.47, no callbacks in the browser
+    ClientsideFunction = None
+from dash.exceptions import PreventUpdate
+from flask import Response, abort, g, jsonify, request
+try:
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
 import plotly.graph_objs as go
 
+import numpy as np
 import pandas as pd
-from pyramid import auto_arima
 
-import datetime
+from anomalies import AnomalyDetector, frame_chunks, SPIKE, BASELOAD
+from cache import FrameCache, DEFAULT_MAX_BYTES
+from downsample import downsample, splice_window
+from figures import compact_dates, compact_values, serialize_figure
+from figures import figure_etag, response_size
+from figures import DEFAULT_MAX_BYTES as DEFAULT_FIGURE_CACHE_BYTES
+import forecast
+from households import ALL_HOUSEHOLDS
+from jobs import JobQueue, finished_job, FINISHED, FAILED, DONE
+from metrics import Metrics, SIZE_BUCKETS, log_event
+from model_cache import ModelCache, ModelRegistry, model_key
+from model_cache import DEFAULT_CACHE_DIR, DEFAULT_REGISTRY_DIR
+from model_cache import DEFAULT_MAX_BYTES as DEFAULT_MODEL_CACHE_BYTES
+from profiles import ProfileCube, WEEKDAYS, HOURS
+from rollup import Rollup, parse_rule
+from seasons import SEASONS, ALL_SEASONS, season_labels, season_table
+from seasons import season_sums
+from seasons import merge_season_tables
+from window import WindowIndex
+
+import threading
+import time
+from collections import OrderedDict
+
+def _job_id(job):
+    # of a job as shown in the page, see AppBuilder.submit_prediction
+    return job.split()[0] if job else None
 
 class AppBuilder(object):
-    def __init__(self, app, df, title = '', subtitle = '', env = 'dev'):
+    def __init__(self, app, df, title = '', subtitle = '', env = 'dev',
+                 resample_cache_bytes=DEFAULT_MAX_BYTES,
+                 prediction_workers=None, model_cache_dir=DEFAULT_CACHE_DIR,
+                 model_cache_bytes=DEFAULT_MODEL_CACHE_BYTES,
+                 model_registry_dir=DEFAULT_REGISTRY_DIR,
+                 figure_cache_bytes=DEFAULT_FIGURE_CACHE_BYTES,
+                 copy_data=True, households=None, loader=None):
         # environment
         self.env = env
+        # latencies and sizes, served by /metrics and shown in the metrics
+        # panel (if metrics_panel)
+        self.metrics = Metrics()
+        self.metrics_panel = env == 'dev'
+        self.metrics_poll_interval = 5000
         # legends for the columns
         self.feature_cols = dict(
             sub_metering_1=dict(
@@ -33,44 +81,7 @@ class AppBuilder(object):
                 color='#B3FFB3'
             )
         )
-        self.seasons = dict(
-            spring=dict(
-                start=dict(
-                    day=20,
-                    month=3),
-                end=dict(
-                    day=20,
-                    month=6),
-                order=1,
-            ),
-            summer=dict(
-                start=dict(
-                    day=21,
-                    month=6),
-                end=dict(
-                    day=21,
-                    month=9),
-                order=2,
-            ),
-            fall=dict(
-                start=dict(
-                    day=22,
-                    month=9),
-                end=dict(
-                    day=20,
-                    month=12),
-                order=3,
-            ),
-            winter=dict(
-                start=dict(
-                    day=21,
-                    month=12),
-                end=dict(
-                    day=19,
-                    month=3),
-                order=4,
-            )
-        )
+        self.seasons = SEASONS
         self.tabs = dict(
             all_data=dict(
                 name='All data',
@@ -80,15 +91,68 @@ class AppBuilder(object):
                 name='By Season',
                 value='build_seasonal_area',
             ),
+            profile=dict(
+                name='Daily profile',
+                value='build_profile_area',
+            ),
             predict=dict(
                 name='Run predictions',
                 value='build_prediction_area'
             )
         )
+        # points per trace sent to the browser: about points_per_pixel for
+        # every pixel of the plotted width. downsample_method is one of
+        # downsample.DOWNSAMPLERS, or None to send every point
+        self.downsample_method = 'lttb'
+        self.chart_width = 1200
+        self.points_per_pixel = 2
+        # a zoomed window of the main chart is sent at the finest of these
+        # resolutions (None being the loaded data) with at most
+        # window_max_rows rows in it, downsampled as any trace
+        self.window_resolutions = [None, '1H', '1D', '1W', '1M']
+        self.window_max_rows = 20000
+        # spikes and abnormal baseloads of the feature columns (see
+        # anomalies.py), found on the loaded data a chunk of
+        # anomaly_chunk_rows rows at a time and shown as markers on the main
+        # chart: at most max_anomaly_markers of them, the highest scores
+        # first
+        self.show_anomalies = True
+        self.anomaly_chunk_rows = 100000
+        self.max_anomaly_markers = 300
+        self.anomaly_markers_style = {
+            SPIKE: dict(
+                legend='Spikes',
+                symbol='triangle-up',
+                color='#D62728'
+            ),
+            BASELOAD: dict(
+                legend='Abnormal baseload',
+                symbol='diamond',
+                color='#9467BD'
+            )
+        }
+        # dates as epoch milliseconds and values rounded to
+        # figures.SIGNIFICANT_DIGITS in the traces sent
+        self.compact_figures = True
         self.season_charts = dict(
             all_data_by_season='build_all_data_seasonal_chart',
             yearly_data_by_season='build_yearly_data_seasonal_chart'
         )
+        # figures served by /figures/<view>, and the query parameters they
+        # take (see add_figure_route)
+        self.figure_views = dict(
+            main=('build_main_figure', ['freq', 'household']),
+            all_data_by_season=('build_all_data_seasonal_figure',
+                                ['mode', 'freq', 'household']),
+            yearly_data_by_season=('build_yearly_data_seasonal_figure',
+                                   ['mode', 'freq', 'household']),
+            profile=('build_profile_figure', ['column', 'season'])
+        )
+        # the frequencies the figures can be asked for, as the side panel
+        # sets them: up to max_freq_count hours, days, weeks or months
+        self.freq_units = ['H', 'D', 'W', 'M']
+        self.max_freq_count = 1000
+        self.bar_modes = ['group', 'stack']
         self.auto_arima_params = dict(
             #y=dict(),
             start_p=dict(value=2),
@@ -105,101 +169,666 @@ class AppBuilder(object):
             max_Q=dict(value=2),
             m=dict(value=1),
             alpha=dict(value=.05))
-        # keep a copy of the original one for resampling purposes
-        self._original_df = df.copy()
-        self.df = df
+        # resampled frames by (frequency, data version)
+        self.resample_cache = FrameCache(max_bytes=resample_cache_bytes)
+        self.precomputed_frequencies = ['1H', '1D', '1W', '1M']
+        # serialized figures and their etags by (view, parameters, data
+        # version)
+        self.figure_cache = FrameCache(max_bytes=figure_cache_bytes,
+                                       size_f=response_size)
+        self.data_version = 0
+        self._rollup = None
+        self._rollup_lock = threading.Lock()
+        # means by season, weekday and hour of the feature columns, see
+        # profile_cube
+        self._profile_cube = None
+        # model fits run in worker processes, polled from the layout
+        self.jobs = JobQueue(max_workers=prediction_workers,
+                             metrics=self.metrics)
+        self.prediction_periods = 12
+        # series forecast by a prediction run: every feature column and
+        # their total, each one fitted in its own worker
+        self.prediction_cols = dict(self.feature_cols)
+        self.prediction_cols['total'] = dict(
+            legend='Total',
+            color='#FF7F0E'
+        )
+        # fitted models and forecasts on disk, by parameters and series
+        self.model_cache = ModelCache(model_cache_dir, model_cache_bytes)
+        # last model of every series and parameters, so new data only
+        # refits the order found instead of searching it again
+        self.model_registry = ModelRegistry(model_registry_dir)
+        # parameters of the last prediction run, refreshed with the data
+        self.prediction_params = None
+        self.prediction_poll_interval = 1000
+        # seconds a fit waits before starting, so a burst of clicks only
+        # starts the last one
+        self.prediction_debounce = .5
+        # keep a copy of the original one for resampling purposes (or the
+        # frame itself, without copy_data, if nothing else modifies it).
+        # frames are never modified once built: callbacks get the one they
+        # need through self.frame(frequency), with the frequency of each
+        # session kept in its own layout (see build_app_layout)
+        self.copy_data = copy_data
+        # with a loader (a function returning the frame) instead of df, the
+        # data is loaded by setup, in the background if asked: the layout is
+        # served meanwhile, the callbacks wait for the data and /ready
+        # answers 503 until it's there (see load)
+        self.loader = loader
+        self.load_error = None
+        self._ready = threading.Event()
+        self._df = None
+        if df is not None:
+            self._original_df = df.copy() if copy_data else df
+        # other households (a households.Households), selectable in the side
+        # panel. their data stays in their partitions, only the aggregates
+        # shown are in memory
+        self.households = households
+        self._is_setup = False
         # assign attributes
         self.app = app
         self.title = title
         self.subtitle = subtitle
 
     @property
-    def df(self):
+    def _original_df(self):
+        self.wait_until_ready()
         return self._df
 
-    @df.setter
-    def df(self, value):
-        self._df = value
+    @_original_df.setter
+    def _original_df(self, df):
+        self._df = df
+        self._ready.set()
 
-    def run(self):
-        debug = True if self.env is 'dev' else False
+    @property
+    def ready(self):
+        return self._ready.is_set() and self.load_error is None
+
+    def wait_until_ready(self, timeout=None):
+        if not self._ready.wait(timeout):
+            raise RuntimeError('data not loaded yet')
+        if self.load_error is not None:
+            raise RuntimeError('data failed to load: {}'.format(
+                self.load_error))
+
+    def load(self, background=True):
+        # runs the loader (if the data isn't there yet), then warms up the
+        # resample cache, in a thread when background
+        def load_and_warm_up():
+            if not self._ready.is_set():
+                try:
+                    with self.metrics.timer('data_load_seconds'):
+                        df = self.loader()
+                except Exception as e:
+                    self.load_error = e
+                    self._ready.set()
+                    log_event('data load failed', error=repr(e))
+                    raise
+                self._original_df = df.copy() if self.copy_data else df
+                log_event('data loaded', rows=len(df))
+            self.precompute_resamples(background=False)
+        if not background:
+            return load_and_warm_up()
+        thread = threading.Thread(target=load_and_warm_up, name='data-load')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def reload_data(self, df):
+        self._original_df = df.copy() if self.copy_data else df
+        self.data_version += 1
+        self._rollup = None
+        self._profile_cube = None
+        self.resample_cache.clear()
+        self.figure_cache.clear()
+        self.precompute_resamples()
+
+    @property
+    def rollup(self):
+        # hour/day/week/month aggregates, built once per data version
+        with self._rollup_lock:
+            if self._rollup is None:
+                self._rollup = Rollup(self._original_df)
+            return self._rollup
+
+    @property
+    def profile_cube(self):
+        # sums and counts by season, weekday and hour, built once and then
+        # updated with the rows appended
+        with self._rollup_lock:
+            if self._profile_cube is None:
+                with self.metrics.timer('profile_build_seconds'):
+                    self._profile_cube = ProfileCube(
+                        self._original_df, self.seasons,
+                        list(self.feature_cols))
+            return self._profile_cube
+
+    def append_data(self, df):
+        # rows from df.index[0] on replace the loaded ones (new rows, and the
+        # last hour if it's been averaged again, see data.refresh_data); the
+        # rollup, the profile cube and the season table are updated with
+        # just those instead of being rebuilt
+        if not len(df):
+            return
+        # same columns and dtypes as the loaded frame (i.e. a lean one)
+        df = df[list(self._original_df)].astype(
+            self._original_df.dtypes.to_dict())
+        table = self.resample_cache.peek(
+            ('season table', None, None, self.data_version))
+        with self._rollup_lock:
+            kept = self._original_df.index.searchsorted(df.index[0])
+            replaced = self._original_df.iloc[kept:]
+            self._original_df = pd.concat([self._original_df.iloc[:kept],
+                                           df])
+            if self._rollup is not None:
+                self._rollup.append(df, self._df)
+            if self._profile_cube is not None:
+                self._profile_cube.remove(replaced)
+                self._profile_cube.append(df)
+        self.data_version += 1
+        self.resample_cache.clear()
+        self.figure_cache.clear()
+        if table is not None:
+            table = merge_season_tables(table, self._season_table(df),
+                                        self.seasons)
+            if len(replaced):
+                table = merge_season_tables(
+                    table, -self._season_table(replaced), self.seasons)
+            self.resample_cache.put(
+                ('season table', None, None, self.data_version), table)
+        self.precompute_resamples()
+
+    def resample(self, freq):
+        version, rollup = self.data_version, self.rollup
+        def compute():
+            with self.metrics.timer('resample_seconds', freq=freq):
+                return rollup.resample(freq)
+        return self.resample_cache.get((freq, version), compute)
+
+    def _season_table(self, df):
+        return season_table(df, self.seasons, list(self.feature_cols))
+
+    def data_resolution(self, rows=1000):
+        # time between the readings of the loaded data (the shortest one
+        # between its first rows)
+        steps = np.diff(self._original_df.index[:rows].asi8)
+        steps = steps[steps > 0]
+        return pd.Timedelta(int(steps.min())) if len(steps) else None
+
+    def _is_data_resolution(self, freq):
+        # a resample of the loaded data by its own resolution sums up to the
+        # same table (gaps only add empty rows)
+        try:
+            n, unit = parse_rule(freq)
+        except ValueError:
+            return False
+        return unit in ('H', 'D') and \
+            pd.Timedelta('{}{}'.format(n, unit)) == self.data_resolution()
+
+    def season_table(self, freq=None, household=None):
+        # sums of the feature columns by year and season of the frame of a
+        # frequency, built once per data version (and merged on append).
+        # the ones of other households without a frequency are sums of their
+        # partitions as stored. the resolution of the loaded data (i.e. 1H,
+        # the UI's default) is the table without a frequency, the one merged
+        # on append
+        version = self.data_version
+        if not household and freq and self._is_data_resolution(freq):
+            freq = None
+        if household and not freq:
+            return self.resample_cache.get(
+                ('household season table', household, version),
+                lambda: self.households.season_table(
+                    self._households(household), self.seasons,
+                    list(self.feature_cols)))
+        def compute():
+            df = self.frame(freq, household)
+            with self.metrics.timer('groupby_seconds', table='season',
+                                    freq=freq):
+                return self._season_table(df)
+        return self.resample_cache.get(
+            ('season table', freq, household, version), compute)
+
+    def frame(self, freq=None, household=None):
+        # the loaded data, or its resample by freq. with a household (see
+        # household_frame), the data of that one instead
+        if household:
+            return self.household_frame(household, freq)
+        if not freq:
+            return self._original_df
+        return self.resample(freq)
+
+    def _households(self, household):
+        ids = self.households.ids() if self.households is not None else []
+        if household == ALL_HOUSEHOLDS:
+            return ids
+        if household not in ids:
+            raise ValueError('unknown household: {}'.format(household))
+        return [household]
+
+    def household_frame(self, household, freq=None):
+        # mean of the feature columns of a household by freq (hourly if
+        # None), or with ALL_HOUSEHOLDS the sum of those of every household,
+        # aggregated by the households' worker pool
+        freq = freq or '1H'
+        households = self._households(household)
+        version = self.data_version
+        def compute():
+            with self.metrics.timer('household_resample_seconds', freq=freq):
+                return self.households.total(households, freq,
+                                             list(self.feature_cols))
+        return self.resample_cache.get(('household', household, freq,
+                                        version), compute)
+
+    def precompute_resamples(self, background=True):
+        # warm up the cache with the most common frequencies, so the first
+        # clicks on those don't have to wait for the resample (nor for the
+        # anomalies shown on the main chart or the profile cube)
+        version = self.data_version
+        def warm_up():
+            for freq in self.precomputed_frequencies:
+                if version != self.data_version:
+                    return
+                self.resample(freq)
+            if version != self.data_version:
+                return
+            self.profile_cube
+            if self.show_anomalies:
+                self.anomalies()
+        if not background:
+            return warm_up()
+        thread = threading.Thread(target=warm_up, name='resample-warm-up')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def setup(self, background=True):
+        # layout and callbacks, once. for a pre-forking server this runs (in
+        # the foreground) before the fork, so the workers start with the
+        # layout, the callbacks, the rollup and the warm cache already there
+        if self._is_setup:
+            return self
+        # before the compression, so the sizes recorded are the ones sent
+        self.add_instrumentation()
+        self.add_compression()
+        self.add_health_routes()
+        self.add_figure_route()
         # build the layout so we can add the callbacks
         self.app.layout = self.build_app_layout()
         # add callbacks
         self.add_main_content_callback()
-        self.add_tabs_callback()
+        self.add_main_zoom_callback()
         self.add_seasonal_content_callback()
+        self.add_profile_callback()
         self.add_prediction_callback()
+        self.add_prediction_poll_callback()
+        self.add_cancel_prediction_callback()
+        if self.metrics_panel:
+            self.add_metrics_panel_callback()
+        # last, so a background load doesn't compete with the rest of the
+        # setup for the interpreter
+        self.load(background=background)
+        self._is_setup = True
+        return self
+
+    def run(self):
+        debug = True if self.env is 'dev' else False
+        self.setup()
         # run development server
         self.app.run_server(debug=debug)
 
+    def add_instrumentation(self):
+        # time and size of every response, by route or, for the callbacks,
+        # by the output they update. the callbacks' own timings are the ones
+        # of their requests
+        server = self.app.server
+
+        @server.before_request
+        def start_request_timer():
+            g.request_start = time.time()
+
+        @server.after_request
+        def record_request(response):
+            start = getattr(g, 'request_start', None)
+            if start is None:
+                return response
+            seconds = time.time() - start
+            handler = self._request_handler()
+            self.metrics.observe('request_seconds', seconds, handler=handler)
+            size = response.content_length
+            if size is not None:
+                self.metrics.observe('response_bytes', size, SIZE_BUCKETS,
+                                     handler=handler)
+            log_event('request', handler=handler,
+                      status=response.status_code,
+                      seconds=round(seconds, 6), bytes=size)
+            return response
+
+        @server.route('/metrics')
+        def serve_metrics():
+            return Response(self.metrics.render(),
+                            mimetype='text/plain; version=0.0.4')
+
+    def add_health_routes(self):
+        # /health: the process answers. /ready: the data is loaded, so
+        # requests can be sent to it (503 until then, or if the load failed)
+        server = self.app.server
+
+        @server.route('/health')
+        def serve_health():
+            return jsonify(status='ok')
+
+        @server.route('/ready')
+        def serve_ready():
+            if self.ready:
+                return jsonify(ready=True, rows=len(self._df),
+                               version=self.data_version)
+            error = self.load_error
+            return jsonify(ready=False,
+                           error=None if error is None else repr(error)), 503
+
+    def _request_handler(self):
+        if request.url_rule is None:
+            return 'unmatched'
+        if request.path.endswith('_dash-update-component'):
+            # the output comes from the client: only the ones of registered
+            # callbacks are labels, so there's a bounded number of them
+            body = request.get_json(silent=True) or dict()
+            output = body.get('output')
+            return output if output in self.app.callback_map else 'other'
+        return request.url_rule.rule
+
+    def add_metrics_panel_callback(self):
+        @self.app.callback(Output('metrics-table', 'children'),
+                           [Input('metrics-poll', 'n_intervals')])
+        def render_metrics(n_intervals):
+            return self.build_metrics_table()
+
+    def add_compression(self):
+        # gzip for every response, callbacks included, when flask-compress
+        # is installed
+        if Compress is not None:
+            Compress(self.app.server)
+
+    def figure_response(self, view, **params):
+        # serialized figure and its etag, built once per data version
+        version = self.data_version
+        def serialize():
+            figure = getattr(self, self.figure_views[view][0])(**params)
+            with self.metrics.timer('figure_serialize_seconds', view=view):
+                body = serialize_figure(figure)
+            self.metrics.observe('figure_bytes', len(body), SIZE_BUCKETS,
+                                 view=view)
+            return body, figure_etag(body)
+        return self.figure_cache.get(
+            (view, tuple(sorted(params.items())), version),
+            serialize)
+
+    def valid_figure_param(self, name, value):
+        # the values the figure views can be built with (empty is the
+        # default of the view)
+        if not value:
+            return True
+        if name == 'freq':
+            try:
+                n, unit = parse_rule(value)
+            except ValueError:
+                return False
+            return value == '{}{}'.format(n, unit) and \
+                unit in self.freq_units and 0 < n <= self.max_freq_count
+        if name == 'household':
+            ids = self.households.ids() if self.households is not None else []
+            return value == ALL_HOUSEHOLDS or value in ids
+        if name == 'mode':
+            return value in self.bar_modes
+        if name == 'column':
+            return value in self.feature_cols
+        if name == 'season':
+            return value == ALL_SEASONS or value in self.seasons
+        return False
+
+    def add_figure_route(self):
+        # plain GETs of the figures, so browsers and proxies can revalidate
+        # them: a client sending back the etag of the current version gets a
+        # 304 without the figure being built, serialized or sent again
+        @self.app.server.route('/figures/<view>')
+        def serve_figure(view):
+            if view not in self.figure_views:
+                abort(404)
+            params = dict((p, request.args[p])
+                          for p in self.figure_views[view][1]
+                          if p in request.args)
+            # anything else would fail to build, or fill the figure cache
+            if not all(self.valid_figure_param(p, v)
+                       for p, v in params.items()):
+                abort(400)
+            body, etag = self.figure_response(view, **params)
+            response = Response(body, mimetype='application/json')
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+
     def add_prediction_callback(self):
-        @self.app.callback(Output('prediction-result', 'children'),
-                           [Input('arima-{}'.format('-'.join(p.split('_'))),
+        # only submits the fit, see add_prediction_poll_callback for the
+        # result. the parameters are read when the button is clicked, and the
+        # job shown (if any) is replaced by the new one
+        @self.app.callback(Output('prediction-job', 'children'),
+                           [Input('run-prediction-button', 'n_clicks')],
+                           [State('prediction-job', 'children')] +
+                           [State('arima-{}'.format('-'.join(p.split('_'))),
                                   'value')
                             for p in list(self.auto_arima_params)])
-        def render_prediction(*args):
+        def render_prediction(n_clicks, job, *args):
+            if not n_clicks:
+                raise PreventUpdate
             kwargs = dict()
             for arg,value in zip(self.auto_arima_params, args):
                 kwargs[arg] = value
-            print(kwargs)
-            total = self._original_df.resample('M').mean()
-            total['total'] = sum([total[c] for c in self.feature_cols])
-            model = self.run_auto_arima(total['total'], **kwargs)
-            print(model)
-            return self.build_prediction_chart(model.predict(n_periods=12))
-
-    def add_tabs_callback(self):
-        @self.app.callback(Output('main-area', 'children'),
-                           [Input('charts-tabs', 'value')])
-        def render_content(tab):
-            return getattr(self, self.tabs[tab]['value'])()
+            log_event('prediction requested', params=kwargs)
+            return self.submit_prediction(kwargs, replaces=_job_id(job))
+
+    def training_frame(self):
+        # monthly feature columns and their total, the series the models are
+        # fitted on
+        version = self.data_version
+        def monthly():
+            return forecast.training_frame(
+                self.resample('1M')[list(self.feature_cols)])
+        return self.resample_cache.get(('training frame', version), monthly)
+
+    def training_series(self):
+        return self.training_frame()['total']
+
+    def submit_prediction(self, kwargs, replaces=None):
+        # returns the job as shown in the page: its id and the cache keys of
+        # its models, see prediction_job
+        self.prediction_params = kwargs
+        df = self.training_frame()[list(self.prediction_cols)]
+        key = tuple(model_key(df[c], kwargs, self.prediction_periods)
+                    for c in df)
+        predictions = OrderedDict((c, forecast.cached_prediction(
+            df[c], self.model_cache, self.prediction_periods, **kwargs))
+                                  for c in df)
+        if all(p is not None for p in predictions.values()):
+            job_id = self.jobs.add_finished(key, predictions,
+                                            replaces=replaces)
+        else:
+            # the cached ones are among the tasks too, they just read the
+            # cache
+            job_id = self.jobs.submit(key, forecast.forecast_tasks(
+                df, self.prediction_periods, self.model_cache,
+                self.model_registry, **kwargs),
+                replaces=replaces, delay=self.prediction_debounce)
+        return ' '.join((job_id,) + key)
+
+    def prediction_job(self, job):
+        # the job shown, from the queue of this process. under a pre-forking
+        # server the poll can reach another worker than the one running it
+        # (every worker has its own queue): there it's the models of the job
+        # in the shared model cache once they're all in, None before
+        if not job:
+            return None
+        job_id, keys = job.split()[0], job.split()[1:]
+        found = self.jobs.get(job_id)
+        if found is not None or not keys or \
+                not all(self.model_cache.has(k) for k in keys):
+            return found
+        predictions = [self.model_cache.get_prediction(k) for k in keys]
+        if any(p is None for p in predictions):
+            return None
+        return finished_job(tuple(keys), OrderedDict(
+            zip(self.prediction_cols, predictions)))
+
+    def refresh_predictions(self):
+        # fits the last parameters run on the current data, in the
+        # background, so the next run of those is a cache hit
+        if self.prediction_params is None:
+            return None
+        return self.submit_prediction(self.prediction_params)
+
+    def prediction_frame(self, results):
+        return forecast.forecast_frame(results,
+                                       self.training_frame().index[-1])
+
+    def add_prediction_poll_callback(self):
+        @self.app.callback(Output('prediction-result', 'children'),
+                           [Input('prediction-poll', 'n_intervals'),
+                            Input('prediction-job', 'children')])
+        def render_prediction_status(n_intervals, job_ref):
+            job = self.prediction_job(job_ref)
+            if job is None:
+                if not job_ref:
+                    raise PreventUpdate
+                # run by another worker, only its models fitted are known
+                keys = job_ref.split()[1:]
+                return html.P(
+                    'Prediction running ({}/{} models fitted)'.format(
+                        sum(1 for k in keys if self.model_cache.has(k)),
+                        len(keys)),
+                    className='notification')
+            status = job.status
+            if status == DONE:
+                return self.build_prediction_chart(
+                    self.prediction_frame(job.results))
+            if status == FAILED:
+                return html.P('Prediction failed: {}'.format(job.error),
+                              className='notification is-danger')
+            done, total = job.progress
+            return html.P(
+                'Prediction {} ({:.0f}s, {}/{} models fitted)'.format(
+                    status, time.time() - job.created, done, total),
+                className='notification')
+
+        # stop polling once the job shown is finished
+        @self.app.callback(Output('prediction-poll', 'disabled'),
+                           [Input('prediction-result', 'children')],
+                           [State('prediction-job', 'children')])
+        def toggle_prediction_poll(result, job_ref):
+            if not job_ref:
+                return True
+            job = self.prediction_job(job_ref)
+            return job is not None and job.status in FINISHED
+
+    def add_cancel_prediction_callback(self):
+        @self.app.callback(Output('prediction-cancelled', 'children'),
+                           [Input('cancel-prediction-button', 'n_clicks')],
+                           [State('prediction-job', 'children')])
+        def cancel_prediction(n_clicks, job):
+            if not n_clicks or not job:
+                raise PreventUpdate
+            # only the worker running it can
+            self.jobs.cancel(_job_id(job))
+            return job
 
     def add_seasonal_content_callback(self):
+        # the bar mode only changes the layout: when the installed dash can
+        # run callbacks in the browser (see assets/clientside.js), the figure
+        # is updated there and the server only renders data changes
+        if not hasattr(self.app, 'clientside_callback'):
+            @self.app.callback(Output('seasonal-chart-area', 'children'),
+                               [Input('seasonal-options', 'value'),
+                                Input('seasonal-mode', 'value'),
+                                Input('current-frequency', 'children'),
+                                Input('household', 'value')])
+            def render_seasonal_content(option, mode, freq, household):
+                return getattr(self, self.season_charts[option])(
+                    mode, freq, household)
+            return
+
         @self.app.callback(Output('seasonal-chart-area', 'children'),
                            [Input('seasonal-options', 'value'),
-                            Input('seasonal-mode', 'value')])
-        def render_seasonal_content(option, mode):
-            return getattr(self, self.season_charts[option])(mode)
+                            Input('current-frequency', 'children'),
+                            Input('household', 'value')],
+                           [State('seasonal-mode', 'value')])
+        def render_seasonal_data(option, freq, household, mode):
+            return getattr(self, self.season_charts[option])(
+                mode, freq, household)
+
+        self.app.clientside_callback(
+            ClientsideFunction(namespace='seasonal', function_name='barmode'),
+            Output('seasonal-graph', 'figure'),
+            [Input('seasonal-mode', 'value')],
+            [State('seasonal-graph', 'figure')])
+
+    def add_profile_callback(self):
+        @self.app.callback(Output('profile-chart-area', 'children'),
+                           [Input('profile-column', 'value'),
+                            Input('profile-season', 'value')])
+        def render_profile(column, season):
+            return self.build_profile_chart(column, season)
 
     def add_main_content_callback(self):
-        @self.app.callback(Output('main-tab-content', 'children'),
+        # the resample button sets the frequency of the session, which the
+        # charts are then built with
+        @self.app.callback(Output('current-frequency', 'children'),
                            [Input('resample-button', 'n_clicks')],
                            [State('resample-frequency', 'value'),
                             State('average-options', 'value')])
-        def render_content(n_clicks, resample_freq, avg_by):
-            self.df = self._original_df.resample(
-                '{}{}'.format(resample_freq,avg_by)).mean()
-            return self.build_chart_all_meters()
-
-    def _get_season_dates_for_x(self, season, x):
-        return (datetime.date(day=self.seasons[season]['start']['day'],
-                              month=self.seasons[season]['start']['month'],
-                              year=(x.year-1) if (season == 'winter' and \
-                                                  x.month <= 3) else \
-                                    x.year),
-                datetime.date(day=self.seasons[season]['end']['day'],
-                              month=self.seasons[season]['end']['month'],
-                              year=(x.year+1) if (season == 'winter' and \
-                                                  x.month == 12) else \
-                                    x.year))
-
-    def _x_in_season(self, season, x):
-        x_date = datetime.date(day=x.day, month=x.month, year=x.year)
-        s_date, e_date = self._get_season_dates_for_x(season, x)
-        return (x_date >= s_date and x_date <= e_date)
-
-    def group_by_season(self):
-        return self.df.groupby(
-            by=lambda x: [s
-                          for s in list(self.seasons)
-                          if self._x_in_season(s,x)][0])
-
-    def group_by_year_and_season(self):
-        return self.df.groupby(
-            by=lambda x: ['{} {}'.format(s,x.year)
-                          for s in list(self.seasons)
-                          if self._x_in_season(s,x)][0])
+        def set_frequency(n_clicks, resample_freq, avg_by):
+            return '{}{}'.format(resample_freq,avg_by)
+
+        @self.app.callback(Output('main-tab-content', 'children'),
+                           [Input('current-frequency', 'children'),
+                            Input('household', 'value')])
+        def render_content(freq, household):
+            return self.build_chart_all_meters(
+                self.frame(freq, household),
+                self.build_anomaly_markers(household))
+
+    def add_main_zoom_callback(self):
+        # zooming or moving the range slider re-sends the traces with the
+        # visible window at the finest resolution that fits (see
+        # window_index), downsampled on its own
+        @self.app.callback(Output('main-chart', 'figure'),
+                           [Input('main-chart', 'relayoutData')],
+                           [State('current-frequency', 'children'),
+                            State('household', 'value')])
+        def render_zoom(relayout_data, freq, household):
+            window = self._get_relayout_window(relayout_data)
+            return self.build_main_figure(freq, window, household)
+
+    def _get_relayout_window(self, relayout_data):
+        relayout_data = relayout_data or dict()
+        if relayout_data.get('xaxis.autorange'):
+            return None
+        if 'xaxis.range' in relayout_data:
+            start, end = relayout_data['xaxis.range']
+        elif 'xaxis.range[0]' in relayout_data:
+            start = relayout_data['xaxis.range[0]']
+            end = relayout_data['xaxis.range[1]']
+        else:
+            # not an x axis change (i.e. autosize)
+            raise PreventUpdate
+        return pd.Timestamp(start), pd.Timestamp(end)
+
+    def _season_labels(self, df):
+        return season_labels(df.index, self.seasons)
+
+    def group_by_season(self, df):
+        return df.groupby(by=self._season_labels(df)[0])
+
+    def group_by_year_and_season(self, df):
+        return df.groupby(by=self._season_labels(df)[1])
 
     def build_title(self):
         return html.Div([
@@ -251,8 +880,25 @@ class AppBuilder(object):
                             children='Resample data',
                             className='button is-primary'),
                 className='control'),
+            self.build_household_selector(),
         ], className='column is-one-fifth')
 
+    def build_household_selector(self):
+        # no household (cleared) is the loaded data. hidden when there are
+        # no others
+        ids = self.households.ids() if self.households is not None else []
+        return html.Div([
+            html.H2('Household', className='subtitle',
+                    style=dict(marginTop='1.5em')),
+            dcc.Dropdown(
+                id='household',
+                options=[dict(label=h, value=h) for h in ids] + [
+                    dict(label='All households', value=ALL_HOUSEHOLDS)],
+                placeholder='Loaded data',
+                value=None,
+            ),
+        ], style=dict() if ids else dict(display='none'))
+
     def get_legend_layout(self, x_pos=.55):
         return dict(
             x=x_pos,
@@ -295,63 +941,158 @@ class AppBuilder(object):
             legend=self.get_legend_layout(),
             hovermode='closest')
 
-    def build_chart_line(self, df, col, legend, color):
+    def max_points(self):
+        return self.chart_width * self.points_per_pixel
+
+    def build_chart_line(self, df, col, legend, color, window_df=None,
+                         kept=None):
+        # kept: the downsample of df[col] if known, see overview_points.
+        # window_df: the visible window (see window_index), spliced in
+        if kept is None:
+            kept = downsample(df.index, df[col].values, self.max_points(),
+                              self.downsample_method)
+        x, y = df.index[kept], df[col].values[kept]
+        if window_df is not None:
+            x, y = splice_window(x, y, window_df.index, window_df[col].values,
+                                 self.max_points(), self.downsample_method)
+        if self.compact_figures:
+            x, y = compact_dates(x), compact_values(y)
         return go.Scatter(
-            x=df.index,
-            y=df[col],
+            x=x,
+            y=y,
             name=legend,
             line=dict(color=color)
         )
 
-    def build_arima_prediction_chart_line(self, prediction_res):
-        last_month = self.df.last('D').index.month[0]
-        last_year = self.df.last('D').index.year[0]
-        date_range = pd.date_range(
-            start='{}-{}-01'.format(last_year, last_month),
-            end='{}-{}-01'.format(last_year+1, last_month),
-            freq='M'
-        )
-        df = pd.DataFrame(dict(date=date_range, values=prediction_res))
-        df.set_index('date', inplace=True)
-        print(df)
+    def build_arima_prediction_chart_line(self, prediction_df, col):
         return self.build_chart_line(
-            df,
-            'values',
-            'Prediction result',
-            '#B3FFB3'
+            prediction_df,
+            col,
+            self.prediction_cols[col]['legend'],
+            self.prediction_cols[col]['color']
         )
 
-    def build_self_df_chart_line(self, col):
+    def build_feature_chart_line(self, df, col, window_df=None, kept=None):
         return self.build_chart_line(
-            self.df,
+            df,
             col,
             self.feature_cols[col]['legend'],
             self.feature_cols[col]['color'],
+            window_df,
+            kept
+        )
+
+    def build_scatter_figure(self, data, window=None):
+        layout = self.get_chart_layout()
+        if window is not None:
+            layout['xaxis']['range'] = [str(w) for w in window]
+        return dict(
+            data=data,
+            layout=layout
         )
 
-    def build_scatter_chart(self, data):
+    def overview_points(self, freq, col, household=None):
+        # positions kept by the downsample of a whole trace, once per
+        # frequency and data version (the zooms only change the window)
+        version = self.data_version
+        def compute():
+            df = self.frame(freq, household)
+            return downsample(df.index, df[col].values, self.max_points(),
+                              self.downsample_method)
+        return self.resample_cache.get(
+            ('overview', freq, col, household, version), compute)
+
+    def window_index(self, freq=None, household=None):
+        # the resolutions finer than the frame of freq, and that frame. the
+        # rows of other households are never loaded, hours are their finest
+        df = self.frame(freq, household)
+        frames = [(r, self.frame(r, household))
+                  for r in self.window_resolutions
+                  if r != freq and (r or not household)]
+        return WindowIndex([(r, f) for r, f in frames if len(f) > len(df)] +
+                           [(freq, df)])
+
+    def build_main_figure(self, freq=None, window=None, household=None):
+        df = self.frame(freq, household)
+        window_df = None
+        if window is not None:
+            window_df = self.window_index(freq, household).query(
+                window[0], window[1], self.window_max_rows)[1]
+        return self.build_scatter_figure(
+            [self.build_feature_chart_line(
+                df, c, window_df, self.overview_points(freq, c, household))
+             for c in self.feature_cols] +
+            self.build_anomaly_markers(household, window),
+            window)
+
+    def anomalies(self):
+        # anomalies of the loaded data, once per data version
+        version = self.data_version
+        def detect():
+            detector = AnomalyDetector(self.seasons, list(self.feature_cols))
+            with self.metrics.timer('anomaly_detection_seconds'):
+                for chunk in frame_chunks(self.frame(),
+                                          self.anomaly_chunk_rows):
+                    detector.update(chunk)
+                return detector.anomalies()
+        return self.resample_cache.get(('anomalies', version), detect)
+
+    def build_anomaly_markers(self, household=None, window=None):
+        # a trace per kind of anomaly, with the highest scores of the window
+        # (or of all the data). the loaded data only
+        if not self.show_anomalies or household:
+            return []
+        df = self.anomalies()
+        if window is not None:
+            df = df.loc[pd.Timestamp(window[0]):pd.Timestamp(window[1])]
+        df = df.iloc[np.argsort(-df.score.abs().values, kind='mergesort')[
+            :self.max_anomaly_markers]].sort_index()
+        markers = []
+        for kind, style in self.anomaly_markers_style.items():
+            kind_df = df[df.kind == kind]
+            x, y = kind_df.index, kind_df.value.values
+            if self.compact_figures:
+                x, y = compact_dates(x), compact_values(y)
+            markers.append(go.Scatter(
+                x=x,
+                y=y,
+                name=style['legend'],
+                mode='markers',
+                marker=dict(symbol=style['symbol'], color=style['color'],
+                            size=9),
+                text=['{}: {:.2f} (usually {:.2f})'.format(
+                    self.feature_cols[c]['legend'], v, e)
+                      for c, v, e in zip(kind_df.column, kind_df.value,
+                                         kind_df.expected)],
+                hoverinfo='x+text'))
+        return markers
+
+    def build_scatter_chart(self, data, graph_id=None):
+        graph_kwargs = dict() if graph_id is None else dict(id=graph_id)
         return html.Div([
             dcc.Graph(
-                figure=dict(
-                    data=data,
-                    layout=self.get_chart_layout()
-                ),
-                style=dict(marginTop='1.5em')
+                figure=self.build_scatter_figure(data),
+                style=dict(marginTop='1.5em'),
+                **graph_kwargs
             )
         ])
 
-    def build_prediction_chart(self, prediction_res):
+    def build_prediction_chart(self, prediction_df):
+        # a line per series forecast, see prediction_frame
         return self.build_scatter_chart(
-            [self.build_arima_prediction_chart_line(prediction_res)])
+            [self.build_arima_prediction_chart_line(prediction_df, c)
+             for c in prediction_df])
 
-    def build_charts(self, cols):
-        return self.build_scatter_chart([self.build_self_df_chart_line(c)
-                                         for c in cols])
+    def build_charts(self, df, cols, markers=()):
+        return self.build_scatter_chart([self.build_feature_chart_line(df, c)
+                                         for c in cols] + list(markers),
+                                        graph_id='main-chart')
     '''
         return html.Div([
             dcc.Graph(
                 figure=dict(
-                    data=[self.build_self_df_chart_line(c) for c in cols],
+                    data=[self.build_feature_chart_line(df, c)
+                          for c in cols],
                     layout=self.get_chart_layout()
                 ),
                 style=dict(marginTop='1.5em')
@@ -359,16 +1100,19 @@ class AppBuilder(object):
         ])
     '''
 
-    def build_chart_all_meters(self):
-        return self.build_charts(self.feature_cols)
+    def build_chart_all_meters(self, df, markers=()):
+        return self.build_charts(df, self.feature_cols, markers)
 
     def build_tabs(self):
         return dcc.Tabs(
             id='charts-tabs',
             value=list(self.tabs)[0],
             children=[
+                # the content of every tab is in the layout, so switching
+                # tabs is done by the browser without a callback
                 dcc.Tab(label=self.tabs[t]['name'],
-                        value=t)
+                        value=t,
+                        children=getattr(self, self.tabs[t]['value'])())
                         for t in self.tabs
         ], style=dict(marginTop='2em'))
 
@@ -387,33 +1131,45 @@ class AppBuilder(object):
             height=550
         )
 
-    def _build_seasonal_chart(self, sort_f, s_df_f, mode):
-        s_df = s_df_f().sum()[list(self.feature_cols)]
-        sorted_cols=sorted(s_df.index, key=sort_f)
-        s_df = s_df.reindex(sorted_cols)
-        return html.Div([dcc.Graph(
-            figure=go.Figure(
-                data=[go.Bar(
-                    x=[s.capitalize() for s in s_df.index],
-                    y=s_df[c],
-                    name=self.feature_cols[c]['legend'],
-                    marker=dict(color=self.feature_cols[c]['color']))
-                      for c in list(self.feature_cols)],
-                layout=self.build_bar_layout(mode))),
-        ])
+    def _build_seasonal_figure(self, s_df, mode):
+        # s_df: sums of the feature columns, in the order of the bars
+        return go.Figure(
+            data=[go.Bar(
+                x=[s.capitalize() for s in s_df.index],
+                y=(compact_values(s_df[c]) if self.compact_figures
+                   else s_df[c]),
+                name=self.feature_cols[c]['legend'],
+                marker=dict(color=self.feature_cols[c]['color']))
+                  for c in list(self.feature_cols)],
+            layout=self.build_bar_layout(mode))
 
-    def build_all_data_seasonal_chart(self, mode):
-        return self._build_seasonal_chart(lambda x:self.seasons[x]['order'],
-                                          self.group_by_season,
-                                          mode)
+    def _build_seasonal_chart(self, figure):
+        return html.Div([dcc.Graph(id='seasonal-graph', figure=figure)])
 
-    def build_yearly_data_seasonal_chart(self, mode):
-        return self._build_seasonal_chart(
-            lambda x:(int(x.split()[1]), self.seasons[x.split()[0]]['order']),
-            self.group_by_year_and_season,
+    def build_all_data_seasonal_figure(self, mode='group', freq=None,
+                                       household=None):
+        return self._build_seasonal_figure(
+            season_sums(self.season_table(freq, household), self.seasons),
+            mode)
+
+    def build_yearly_data_seasonal_figure(self, mode='group', freq=None,
+                                          household=None):
+        table = self.season_table(freq, household)
+        return self._build_seasonal_figure(
+            table.set_index(pd.Index(['{} {}'.format(s, y)
+                                      for y, s in table.index])),
             mode
         )
 
+    def build_all_data_seasonal_chart(self, mode, freq=None, household=None):
+        return self._build_seasonal_chart(
+            self.build_all_data_seasonal_figure(mode, freq, household))
+
+    def build_yearly_data_seasonal_chart(self, mode, freq=None,
+                                         household=None):
+        return self._build_seasonal_chart(
+            self.build_yearly_data_seasonal_figure(mode, freq, household))
+
     def build_seasonal_sidebar(self):
         return html.Div([
             html.H2('Group by', className='subtitle',
@@ -452,6 +1208,65 @@ class AppBuilder(object):
             html.Div(id='seasonal-chart-area', className='column')
         ], className='columns')
 
+    def build_profile_figure(self, column=None, season=None):
+        # mean of a feature column by weekday and hour of the day, of a
+        # season or of the whole year. the cube is the same whatever the
+        # frequency of the session, so is the figure
+        column = column or list(self.feature_cols)[0]
+        if column not in self.feature_cols:
+            raise ValueError('unknown column: {}'.format(column))
+        season = season if season in self.seasons else None
+        z = self.profile_cube.means(column, season)
+        return go.Figure(
+            data=[go.Heatmap(
+                z=([compact_values(row) for row in z]
+                   if self.compact_figures else z),
+                x=['{:02d}:00'.format(h) for h in range(HOURS)],
+                y=WEEKDAYS,
+                colorscale='YlOrRd',
+                reversescale=True,
+                colorbar=dict(title='Wh'))],
+            layout=go.Layout(
+                title='{}, {}'.format(
+                    self.feature_cols[column]['legend'],
+                    season.capitalize() if season else 'all year'),
+                xaxis=dict(title='Hour of the day'),
+                yaxis=dict(autorange='reversed'),
+                height=550))
+
+    def build_profile_chart(self, column=None, season=None):
+        return html.Div([dcc.Graph(id='profile-graph',
+                                   figure=self.build_profile_figure(
+                                       column, season))])
+
+    def build_profile_sidebar(self):
+        return html.Div([
+            html.H2('Consumption of', className='subtitle',
+                    style=dict(marginTop='1.5em')),
+            dcc.RadioItems(
+                id='profile-column',
+                value=list(self.feature_cols)[0],
+                options=[dict(label=self.feature_cols[c]['legend'], value=c)
+                         for c in self.feature_cols]
+            ),
+            html.H2('Season', className='subtitle',
+                    style=dict(marginTop='1.5em')),
+            dcc.RadioItems(
+                id='profile-season',
+                value=ALL_SEASONS,
+                options=[dict(label='All year', value=ALL_SEASONS)] + [
+                    dict(label=s.capitalize(), value=s)
+                    for s in sorted(self.seasons,
+                                    key=lambda s: self.seasons[s]['order'])]
+            ),
+        ], className='column is-one-fifth')
+
+    def build_profile_area(self):
+        return html.Div([
+            self.build_profile_sidebar(),
+            html.Div(id='profile-chart-area', className='column')
+        ], className='columns')
+
     def build_arima_parameters(self):
         return html.Div([
                 html.Div([
@@ -504,25 +1319,63 @@ class AppBuilder(object):
                     className='subtitle',
                     style=dict(marginTop='1.5em')),
                 self.build_arima_parameters(),
-                html.Button(id='run-prediction-button', n_clicks=0,
-                            children='Run prediction',
-                            className='button is-primary'),
+                html.Div([
+                    html.P(
+                        html.Button(id='run-prediction-button', n_clicks=0,
+                                    children='Run prediction',
+                                    className='button is-primary'),
+                        className='control'),
+                    html.P(
+                        html.Button(id='cancel-prediction-button',
+                                    n_clicks=0,
+                                    children='Cancel',
+                                    className='button'),
+                        className='control'),
+                ], className='field is-grouped'),
             ], className='column is-one-fifth'),
             html.Div([
-                html.Div(id='prediction-result')
+                html.Div(id='prediction-result'),
+                # the job shown and the last one cancelled, see
+                # submit_prediction
+                html.Div(id='prediction-job', style=dict(display='none')),
+                html.Div(id='prediction-cancelled',
+                         style=dict(display='none')),
+                dcc.Interval(id='prediction-poll',
+                             interval=self.prediction_poll_interval,
+                             n_intervals=0),
             ], className='column')
         ], className='columns')
 
     def run_auto_arima(self, y, **kwargs):
-        print(kwargs)
-        return auto_arima(
-            y,
-            seasonal=True,
-            trace=True,
-            error_action='ignore',  # don't want to know if an order does not work
-            suppress_warnings=True,  # don't want convergence warnings
-            stepwise=True,  # set to stepwise
-            **kwargs)
+        return forecast.run_auto_arima(y, **kwargs)
+
+    def build_metrics_table(self):
+        def label(name, labels):
+            return '{} {}'.format(name, ' '.join(
+                '{}={}'.format(k, v) for k, v in sorted(labels.items())))
+        def value(name, v):
+            if name.endswith('_bytes'):
+                return '{:.0f} B'.format(v)
+            return '{:.1f} ms'.format(v * 1000)
+        return html.Table([
+            html.Thead(html.Tr([html.Th(h) for h in
+                                ['', 'count', 'mean', 'p95', 'max']])),
+            html.Tbody([
+                html.Tr([html.Td(label(name, labels)), html.Td(count)] +
+                        [html.Td(value(name, v)) for v in (mean, p95, top)])
+                for name, labels, count, mean, p95, top
+                in self.metrics.summary()]),
+        ], className='table is-narrow is-fullwidth')
+
+    def build_metrics_panel(self):
+        return html.Div([
+            html.H2('Timings', className='subtitle',
+                    style=dict(marginTop='1.5em')),
+            html.Div(id='metrics-table'),
+            dcc.Interval(id='metrics-poll',
+                         interval=self.metrics_poll_interval,
+                         n_intervals=0),
+        ])
 
     def build_app_layout(self):
         return html.Div([
@@ -530,8 +1383,11 @@ class AppBuilder(object):
                 html.Div([
                     self.build_title(),
                     self.build_tabs(),
-                    html.Div(id='main-area')
-                ], className='container'),
+                    # per session state
+                    html.Div(id='current-frequency',
+                             style=dict(display='none')),
+                ] + ([self.build_metrics_panel()] if self.metrics_panel
+                     else []), className='container'),
             ], className='section'),
         ])
 
@@ -0,0 +1,84 @@
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+
+def frame_size(value):
+    if hasattr(value, 'memory_usage'):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, 'sum') else usage)
+    return int(getattr(value, 'nbytes', 0))
+
+class FrameCache(object):
+    # thread safe LRU of frames with a memory budget. keys are expected to
+    # carry the version of the data they were computed from, so stale entries
+    # are never hit and just age out (or get dropped by clear())
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, size_f=frame_size):
+        self.max_bytes = max_bytes
+        self.size_f = size_f
+        self._frames = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # keys being computed right now, so concurrent misses wait for the
+        # first computation instead of repeating it
+        self._computing = dict()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._frames
+
+    def __len__(self):
+        return len(self._frames)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get(self, key, compute_f):
+        while True:
+            with self._lock:
+                if key in self._frames:
+                    self._frames.move_to_end(key)
+                    return self._frames[key][0]
+                event = self._computing.get(key)
+                if event is None:
+                    event = self._computing[key] = threading.Event()
+                    break
+            event.wait()
+            # the computation failed or the value didn't fit the budget, try
+            # again (if it failed again, it will raise for this caller too)
+            with self._lock:
+                if key not in self._frames and key not in self._computing:
+                    event = self._computing[key] = threading.Event()
+                    break
+        try:
+            value = compute_f()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._computing[key]
+            event.set()
+
+    def peek(self, key):
+        # the value if cached, without computing it nor refreshing it
+        with self._lock:
+            entry = self._frames.get(key)
+            return None if entry is None else entry[0]
+
+    def put(self, key, value):
+        size = self.size_f(value)
+        with self._lock:
+            if key in self._frames:
+                self._bytes -= self._frames.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._frames[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._bytes -= self._frames.popitem(last=False)[1][1]
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._bytes = 0
@@ -1,4 +1,9 @@
 #!/usr/bin/python
+import argparse
+import hashlib
+import json
+import os
+from collections import OrderedDict
 from os import path
 
 import pandas as pd
@@ -9,12 +14,27 @@ import numpy as np
 #from statsmodels.graphics.tsaplots import plot_acf
 #from statsmodels.graphics.tsaplots import plot_pacf
 
-BASE_PATH = '/mnt/files/Documents/Ubiqum/Task3/2/electricity_app/data/'
+BASE_PATH = os.environ.get(
+    'ELECTRICITY_APP_DATA',
+    '/mnt/files/Documents/Ubiqum/Task3/2/electricity_app/data/')
 DATA_FILE = 'full_data.csv'
 #PARSED_DATA_FILE = 'full_data.csv'
 PARSED_DATA_FILE = 'hourly.csv'
 RESAMPLED_MONTH_DATA_FILE = 'resampled_month.csv'
 
+# binary columnar stores (a directory next to the csv they replace, i.e.
+# hourly.store): one row of values.npy per column, the epoch (ns) of every row
+# in index.npy and what's needed to rebuild the frame in meta.json
+STORE_EXT = '.store'
+STORE_VALUES_FILE = 'values.npy'
+STORE_INDEX_FILE = 'index.npy'
+STORE_META_FILE = 'meta.json'
+STORE_DTYPES = ['float64', 'float32']
+# rows of full_data.csv parsed at a time by ingest_raw_data
+RAW_CHUNK_SIZE = 100000
+# dates of full_data.csv, i.e. 16/12/2006;17:24:00
+RAW_DATE_FORMAT = '%d/%m/%Y %H:%M:%S'
+
 #DATA_FILE_PATH = path.join(BASE_PATH, DATA_FILE)
 
 BG_COLOR = '#283A54'
@@ -30,18 +50,177 @@ CONVERT_COLS = [
     ('Sub_metering_3', 'to_numeric')
 ]
 
+# columns that are sums of others: cheap enough to be computed when needed
+# (see derived_column) instead of kept in memory by lean_frame
+def _global_apparent_power(df):
+    return df['global_active_power'] + df['global_reactive_power']
+
+def _total_sub_metering(df):
+    return df['sub_metering_1'] + df['sub_metering_2'] + df['sub_metering_3']
+
+def _total_sub_no_sub_metering(df):
+    return _total_sub_metering(df) + df['not_sub_metering']
+
+DERIVED_COLS = OrderedDict([
+    ('global_apparent_power', _global_apparent_power),
+    ('total_sub_metering', _total_sub_metering),
+    ('total_sub_no_sub_metering', _total_sub_no_sub_metering),
+])
+# largest error float32 is allowed to make on a column: a tenth of the
+# resolution of the readings (watt-hours and kilowatts to 3 decimals)
+FLOAT32_ATOL = 1e-4
+
 def get_file_path(f):
     return path.join(BASE_PATH, f)
 
-def load_data():
-    return pd.read_csv(get_file_path(PARSED_DATA_FILE),
+def get_store_path(f):
+    return get_file_path(path.splitext(f)[0] + STORE_EXT)
+
+def file_hash(file_path, block_size=1024 ** 2):
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _source_meta(source_path):
+    if source_path is None:
+        return None
+    stat = os.stat(source_path)
+    return dict(path=path.abspath(source_path),
+                mtime=stat.st_mtime,
+                size=stat.st_size,
+                sha256=file_hash(source_path))
+
+def _column_stats(values):
+    return dict(sum=float(np.nansum(values)),
+                count=int(np.count_nonzero(values == values)))
+
+def read_store_meta(store_path):
+    with open(path.join(store_path, STORE_META_FILE)) as f:
+        return json.load(f)
+
+def write_store(df, store_path, source_path=None, dtype='float64'):
+    if dtype not in STORE_DTYPES:
+        raise ValueError('unsupported store dtype: {}'.format(dtype))
+    if not path.isdir(store_path):
+        os.makedirs(store_path)
+    # meta.json is written last, so a store without it (or with one that
+    # doesn't match the arrays) is never read
+    meta_path = path.join(store_path, STORE_META_FILE)
+    if path.exists(meta_path):
+        os.remove(meta_path)
+    values_path = path.join(store_path, STORE_VALUES_FILE)
+    values = np.lib.format.open_memmap(values_path + '.tmp', mode='w+',
+                                       dtype=dtype, shape=(len(df.columns),
+                                                           len(df)))
+    for i, c in enumerate(df):
+        values[i] = df[c].values
+    values.flush()
+    del values
+    os.replace(values_path + '.tmp', values_path)
+    index_path = path.join(store_path, STORE_INDEX_FILE)
+    with open(index_path + '.tmp', 'wb') as f:
+        np.save(f, df.index.values.astype('datetime64[ns]').view(np.int64))
+    os.replace(index_path + '.tmp', index_path)
+    stats = dict((c, _column_stats(df[c].values)) for c in df)
+    return _write_store_meta(store_path, list(df.columns), df.index.name,
+                             len(df), dtype, source_path, stats)
+
+def _write_store_meta(store_path, columns, index_name, rows, dtype,
+                      source_path, stats):
+    # stats are the running sum and count of the non NaN values of every
+    # column, before filling them (see ingest_raw_data)
+    meta = dict(columns=columns,
+                index_name=index_name,
+                rows=rows,
+                dtype=dtype,
+                source=_source_meta(source_path),
+                stats=stats)
+    _dump_store_meta(store_path, meta)
+    return meta
+
+def _dump_store_meta(store_path, meta):
+    meta_path = path.join(store_path, STORE_META_FILE)
+    with open(meta_path + '.tmp', 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+
+def store_is_fresh(store_path, source_path):
+    try:
+        meta = read_store_meta(store_path)
+    except (IOError, OSError, ValueError):
+        return False
+    if not path.exists(source_path):
+        # the store is all we have
+        return True
+    source = meta.get('source')
+    if not source:
+        return False
+    stat = os.stat(source_path)
+    if stat.st_size != source['size']:
+        return False
+    if stat.st_mtime == source['mtime']:
+        return True
+    # touched but maybe not changed
+    return file_hash(source_path) == source['sha256']
+
+def read_store(store_path):
+    meta = read_store_meta(store_path)
+    # memory mapped, read only: the pages are shared by every process reading
+    # the same store and only loaded when used
+    values = np.load(path.join(store_path, STORE_VALUES_FILE), mmap_mode='r')
+    epochs = np.load(path.join(store_path, STORE_INDEX_FILE), mmap_mode='r')
+    if values.shape != (len(meta['columns']), meta['rows']) or \
+            len(epochs) != meta['rows']:
+        raise ValueError('corrupted store: {}'.format(store_path))
+    index = pd.DatetimeIndex(np.asarray(epochs).view('datetime64[ns]'),
+                             name=meta['index_name'])
+    # values.T is (rows, columns) and becomes the frame's single block as is
+    return pd.DataFrame(values.T, index=index, columns=meta['columns'],
+                        copy=False)
+
+def _read_parsed_csv(f):
+    return pd.read_csv(get_file_path(f),
                        parse_dates=['Date_Time'],
                        infer_datetime_format=True, index_col = 'Date_Time')
 
-def parse_raw_data():
-    df = pd.read_csv(get_file_path(DATA_FILE), sep=';',
-                     parse_dates=[['Date', 'Time']],
-                     infer_datetime_format=True, index_col = 'Date_Time')
+def _load_parsed_file(f):
+    # use the binary store when it's up to date, the csv otherwise
+    store_path = get_store_path(f)
+    if store_is_fresh(store_path, get_file_path(f)):
+        try:
+            return read_store(store_path)
+        except (IOError, OSError, ValueError):
+            pass
+    return _read_parsed_csv(f)
+
+def convert_to_store(f, dtype='float64'):
+    return write_store(_read_parsed_csv(f), get_store_path(f),
+                       source_path=get_file_path(f), dtype=dtype)
+
+def load_data(lean=False):
+    # lean: see lean_frame
+    df = _load_parsed_file(PARSED_DATA_FILE)
+    return lean_frame(df) if lean else df
+
+def _parse_raw_dates(df):
+    # with an explicit format: a guessed one is guessed again for every chunk
+    # and takes 4/5/2007 as april 5th when that's the chunk's first date
+    df.index = pd.DatetimeIndex(
+        pd.to_datetime(df.pop('Date') + ' ' + df.pop('Time'),
+                       format=RAW_DATE_FORMAT),
+        name='Date_Time')
+    return df
+
+def _read_raw_data(f=None, chunksize=None):
+    reader = pd.read_csv(f or get_file_path(DATA_FILE), sep=';',
+                         dtype=dict(Date=str, Time=str), chunksize=chunksize)
+    if chunksize is None:
+        return _parse_raw_dates(reader)
+    return (_parse_raw_dates(chunk) for chunk in reader)
+
+def convert_raw_data(df, derived=True):
     # convert to numeric
     for (col, convert_f) in CONVERT_COLS:
         df[col] = getattr(pd, convert_f)(df[col], errors='coerce')
@@ -50,8 +229,8 @@ def parse_raw_data():
     df.columns = [c.lower() for c in df]
     # create new columns
     # create global_apparent_energy by summing active and reactive power
-    df['global_apparent_power'] = (df['global_active_power'] +
-                                   df['global_reactive_power']).values
+    if derived:
+        df['global_apparent_power'] = _global_apparent_power(df).values
     # 1.(global_active_power*1000/60 - sub_metering_1 - sub_metering_2 -
     # sub_metering_3) represents the active energy consumed every minute
     # (in watt hour) in the household by electrical equipment not measured in
@@ -61,16 +240,241 @@ def parse_raw_data():
                               - df.sub_metering_1
                               - df.sub_metering_2
                               - df.sub_metering_3)
-    df['total_sub_metering'] = (df.sub_metering_1
-                                + df.sub_metering_2
-                                + df.sub_metering_3)
-    df['total_sub_no_sub_metering'] = (df.total_sub_metering
-                                       + df.not_sub_metering)
+    if derived:
+        df['total_sub_metering'] = _total_sub_metering(df)
+        df['total_sub_no_sub_metering'] = _total_sub_no_sub_metering(df)
+    return df
+
+def derived_column(df, name):
+    # the column if df has it, computed from the others otherwise
+    if name in df:
+        return df[name]
+    return DERIVED_COLS[name](df).rename(name)
+
+def with_derived_columns(df, names=None):
+    # a frame with the derived columns it lacks (all of them, or names)
+    return df.assign(**OrderedDict(
+        (n, derived_column(df, n)) for n in (names or DERIVED_COLS)
+        if n not in df))
+
+def lean_frame(df, atol=FLOAT32_ATOL):
+    # the frame without the derived columns and with float32 columns where
+    # float32 holds the values to within atol
+    columns = OrderedDict()
+    for c in df:
+        if c in DERIVED_COLS:
+            continue
+        values = df[c].values
+        if values.dtype == np.float64 and len(values):
+            lean = values.astype(np.float32)
+            with np.errstate(invalid='ignore'):
+                error = np.nanmax(np.abs(lean - values)) \
+                    if not np.isnan(values).all() else 0.
+            if error <= atol:
+                values = lean
+        columns[c] = values
+    return pd.DataFrame(columns, index=df.index, columns=list(columns))
+
+def parse_raw_data(lean=False):
+    df = convert_raw_data(_read_raw_data(), derived=not lean)
     for c in df:
         df[c] = df[c].fillna(df[c].mean())
+    return lean_frame(df) if lean else df
+
+def iter_raw_data(chunksize=RAW_CHUNK_SIZE, derived=True):
+    # the rows of full_data.csv converted (see convert_raw_data) a chunk at a
+    # time, NaNs left as they are
+    for chunk in _read_raw_data(chunksize=chunksize):
+        yield convert_raw_data(chunk, derived)
+
+def ingest_raw_data(store_path=None, chunksize=RAW_CHUNK_SIZE,
+                    dtype='float64'):
+    # same frame as parse_raw_data, streamed into a store chunk by chunk so
+    # memory is bounded by the chunk size whatever the size of the file.
+    # converted chunks are appended to scratch files (one per column) while
+    # keeping the sum and count of every column; NaNs are filled with those
+    # means when the scratch files are laid out as the store
+    store_path = store_path or get_store_path(DATA_FILE)
+    if dtype not in STORE_DTYPES:
+        raise ValueError('unsupported store dtype: {}'.format(dtype))
+    if not path.isdir(store_path):
+        os.makedirs(store_path)
+    meta_path = path.join(store_path, STORE_META_FILE)
+    if path.exists(meta_path):
+        os.remove(meta_path)
+    scratch = dict()
+    columns, index_name, rows = None, None, 0
+    stats = dict()
+    index_file = open(path.join(store_path, 'index.scratch'), 'wb')
+    try:
+        for chunk in iter_raw_data(chunksize):
+            if columns is None:
+                columns, index_name = list(chunk.columns), chunk.index.name
+                for i, c in enumerate(columns):
+                    scratch[c] = open(path.join(
+                        store_path, '{}.scratch'.format(i)), 'wb')
+                    stats[c] = dict(sum=0., count=0)
+            for c in columns:
+                values = chunk[c].values.astype(np.float64)
+                values.tofile(scratch[c])
+                chunk_stats = _column_stats(values)
+                stats[c]['sum'] += chunk_stats['sum']
+                stats[c]['count'] += chunk_stats['count']
+            chunk.index.values.astype('datetime64[ns]').view(
+                np.int64).tofile(index_file)
+            rows += len(chunk)
+        for f in list(scratch.values()) + [index_file]:
+            f.close()
+        _layout_store(store_path, columns or [], rows, dtype, stats,
+                      chunksize)
+    finally:
+        for f in list(scratch.values()) + [index_file]:
+            f.close()
+            os.remove(f.name)
+    return _write_store_meta(store_path, columns or [], index_name, rows,
+                             dtype, get_file_path(DATA_FILE), stats)
+
+def _layout_store(store_path, columns, rows, dtype, stats, block_size):
+    values_path = path.join(store_path, STORE_VALUES_FILE)
+    values = np.lib.format.open_memmap(values_path + '.tmp', mode='w+',
+                                       dtype=dtype,
+                                       shape=(len(columns), rows))
+    for i, c in enumerate(columns):
+        mean = stats[c]['sum'] / stats[c]['count'] \
+            if stats[c]['count'] else np.nan
+        column = np.memmap(path.join(store_path, '{}.scratch'.format(i)),
+                           dtype=np.float64, mode='r', shape=(rows,)) \
+            if rows else np.empty(0)
+        for start in range(0, rows, block_size):
+            block = np.array(column[start:start + block_size])
+            block[np.isnan(block)] = mean
+            values[i, start:start + block_size] = block
+        del column
+    values.flush()
+    del values
+    os.replace(values_path + '.tmp', values_path)
+    index_path = path.join(store_path, STORE_INDEX_FILE)
+    index = np.lib.format.open_memmap(index_path + '.tmp', mode='w+',
+                                      dtype=np.int64, shape=(rows,))
+    if rows:
+        index[:] = np.memmap(path.join(store_path, 'index.scratch'),
+                             dtype=np.int64, mode='r', shape=(rows,))
+    index.flush()
+    del index
+    os.replace(index_path + '.tmp', index_path)
+
+def append_to_store(df, store_path, block_size=RAW_CHUNK_SIZE,
+                    replace=False):
+    # appends the rows of df newer than the stored ones, or with replace the
+    # rows of df replace the stored ones from df.index[0] on (i.e. the last
+    # hour, completed by new readings). NaNs are filled with the running
+    # means of the store, updated with the new rows, so the stored rows are
+    # copied over but never recomputed. returns the appended rows
+    meta = read_store_meta(store_path)
+    columns, rows = meta['columns'], meta['rows']
+    old_values = np.load(path.join(store_path, STORE_VALUES_FILE),
+                         mmap_mode='r')
+    old_index = np.load(path.join(store_path, STORE_INDEX_FILE),
+                        mmap_mode='r')
+    df = df[columns]
+    epochs = df.index.values.astype('datetime64[ns]').view(np.int64)
+    stats = meta.get('stats') or dict(
+        (c, _column_stats(old_values[i])) for i, c in enumerate(columns))
+    kept = rows
+    if rows and replace and len(df):
+        kept = int(np.searchsorted(old_index, epochs[0], side='left'))
+        for i, c in enumerate(columns):
+            old_stats = _column_stats(old_values[i, kept:rows])
+            stats[c] = dict(sum=stats[c]['sum'] - old_stats['sum'],
+                            count=stats[c]['count'] - old_stats['count'])
+    elif rows:
+        df = df[epochs > old_index[-1]]
+    df = df.copy()
+    for c in columns:
+        new_stats = _column_stats(df[c].values)
+        stats[c] = dict(sum=stats[c]['sum'] + new_stats['sum'],
+                        count=stats[c]['count'] + new_stats['count'])
+        if stats[c]['count']:
+            df[c] = df[c].fillna(stats[c]['sum'] / stats[c]['count'])
+    if not len(df):
+        return df
+    total = kept + len(df)
+
+    values_path = path.join(store_path, STORE_VALUES_FILE)
+    values = np.lib.format.open_memmap(values_path + '.tmp', mode='w+',
+                                       dtype=meta['dtype'],
+                                       shape=(len(columns), total))
+    for start in range(0, kept, block_size):
+        stop = min(start + block_size, kept)
+        values[:, start:stop] = old_values[:, start:stop]
+    for i, c in enumerate(columns):
+        values[i, kept:] = df[c].values
+    values.flush()
+    del values, old_values
+    index_path = path.join(store_path, STORE_INDEX_FILE)
+    index = np.lib.format.open_memmap(index_path + '.tmp', mode='w+',
+                                      dtype=np.int64, shape=(total,))
+    index[:kept] = old_index[:kept]
+    index[kept:] = df.index.values.astype('datetime64[ns]').view(np.int64)
+    index.flush()
+    del index, old_index
+
+    os.remove(path.join(store_path, STORE_META_FILE))
+    os.replace(values_path + '.tmp', values_path)
+    os.replace(index_path + '.tmp', index_path)
+    meta['rows'], meta['stats'] = total, stats
+    _dump_store_meta(store_path, meta)
     return df
 
+def append_raw_data(f, store_path=None):
+    # new readings, in the format of full_data.csv, appended to the store
+    # written by ingest_raw_data
+    return append_to_store(convert_raw_data(_read_raw_data(f)),
+                           store_path or get_store_path(DATA_FILE))
+
+def refresh_data(f, store_path=None):
+    # appends new readings to the raw store and, as hourly means, to the store
+    # of PARSED_DATA_FILE if there's one. the hour of the first new reading is
+    # averaged again from the raw store (it was partial if the last file
+    # ended within it) and replaces the stored one. returns the hourly rows
+    # from that hour on
+    store_path = store_path or get_store_path(DATA_FILE)
+    new = append_raw_data(f, store_path)
+    if not len(new):
+        return new.resample('H').mean()
+    raw = read_store(store_path)
+    raw = raw.iloc[raw.index.searchsorted(new.index[0].floor('H')):]
+    hourly = raw.resample('H').mean()
+    parsed_path = get_store_path(PARSED_DATA_FILE)
+    if path.exists(path.join(parsed_path, STORE_META_FILE)):
+        hourly = append_to_store(hourly, parsed_path, replace=True)
+    return hourly
+
 def load_resampled_data_by_month():
-    return pd.read_csv(get_file_path(RESAMPLED_MONTH_DATA_FILE),
-                       parse_dates=['Date_Time'],
-                       infer_datetime_format=True, index_col = 'Date_Time')
+    return _load_parsed_file(RESAMPLED_MONTH_DATA_FILE)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Convert the data files to binary columnar stores')
+    parser.add_argument('--raw', action='store_true',
+                        help=('store the output of parse_raw_data ({}) '
+                              'instead of the parsed csv files'.format(
+                                  DATA_FILE)))
+    parser.add_argument('--dtype', choices=STORE_DTYPES, default='float64')
+    parser.add_argument('--append', metavar='FILE',
+                        help=('append the new readings in FILE (same format '
+                              'as {}) to the existing stores'.format(
+                                  DATA_FILE)))
+    args = parser.parse_args(argv)
+    if args.append:
+        refresh_data(args.append)
+        return
+    if args.raw:
+        ingest_raw_data(dtype=args.dtype)
+        return
+    for f in (PARSED_DATA_FILE, RESAMPLED_MONTH_DATA_FILE):
+        if path.exists(get_file_path(f)):
+            convert_to_store(f, dtype=args.dtype)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import numpy as np
+
+# all the downsamplers take the x and y arrays of a trace and the maximum
+# number of points to keep, and return the (sorted) positions to keep
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    return x.astype(np.float64)
+
+def _bucket_starts(start, stop, n_buckets):
+    return np.linspace(start, stop, n_buckets + 1).astype(np.int64)
+
+# buckets up to this size are scanned in python, faster than numpy calls on
+# a few values. bigger ones are scanned with numpy
+LTTB_PY_BUCKET = 64
+
+def lttb(x, y, n_out):
+    # largest triangle three buckets: keeps first and last points and, for
+    # every bucket in between, the point making the largest triangle with the
+    # previously kept point and the average of the next bucket
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x, y = _as_float(x), np.asarray(y, dtype=np.float64)
+    edges = _bucket_starts(1, n - 1, n_out - 2)
+    # averages of all the buckets at once (missing values left out), each
+    # one being the third point of the triangles of the previous bucket
+    valid = ~np.isnan(y[:-1])
+    x_means = np.add.reduceat(x[:-1], edges[:-1]) / np.diff(edges)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        y_means = (np.add.reduceat(np.where(valid, y[:-1], 0), edges[:-1]) /
+                   np.add.reduceat(valid, edges[:-1]))
+    next_xs = np.append(x_means[1:], x[-1]).tolist()
+    next_ys = np.append(y_means[1:], y[-1]).tolist()
+    xs, ys = x.tolist(), y.tolist()
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        x_a, y_a, next_x, next_y = xs[a], ys[a], next_xs[i], next_ys[i]
+        if next_y != next_y:
+            next_y = y_a
+        if stop - start > LTTB_PY_BUCKET:
+            area = np.abs((x_a - next_x) * (y[start:stop] - y_a)
+                          - (x_a - x[start:stop]) * (next_y - y_a))
+            area[np.isnan(area)] = -1
+            a = start + int(np.argmax(area))
+        else:
+            # nan areas are never > the best, so nan points are only kept
+            # when the bucket has nothing else
+            a, best = start, -1.
+            for j in range(start, stop):
+                area = abs((x_a - next_x) * (ys[j] - y_a)
+                           - (x_a - xs[j]) * (next_y - y_a))
+                if area > best:
+                    a, best = j, area
+        kept[i + 1] = a
+    return kept
+
+def minmax(x, y, n_out):
+    # keeps the minimum and the maximum of every bucket, so peaks survive
+    n = len(y)
+    if n_out >= n or n_out < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    starts = _bucket_starts(0, n, max(n_out // 2, 1))[:-1]
+    starts = np.unique(starts)
+    bucket = np.repeat(np.arange(len(starts)), np.diff(np.append(starts, n)))
+    kept = []
+    for reduce_f in (np.fmin, np.fmax):
+        extreme = reduce_f.reduceat(y, starts)
+        hits = np.flatnonzero(y == extreme[bucket])
+        # first hit of every bucket
+        kept.append(hits[np.unique(bucket[hits], return_index=True)[1]])
+    return np.unique(np.concatenate(kept + [[0, n - 1]]))
+
+DOWNSAMPLERS = dict(
+    lttb=lttb,
+    minmax=minmax,
+)
+
+def downsample(x, y, n_out, method='lttb'):
+    if method is None:
+        return np.arange(len(y))
+    return DOWNSAMPLERS[method](x, y, n_out)
+
+def splice_window(x, y, window_x, window_y, n_out, method='lttb'):
+    # (x, y), the already downsampled whole trace, with the part covered by
+    # a window (window_x, window_y), maybe at a finer resolution, replaced by
+    # a downsample of its own. the whole range stays available (i.e. for the
+    # range slider) and the visible part gets up to n_out points
+    x, y = np.asarray(x), np.asarray(y)
+    window_x, window_y = np.asarray(window_x), np.asarray(window_y)
+    if not len(window_x):
+        return x, y
+    inner = downsample(window_x, window_y, n_out, method)
+    before, after = x < window_x[0], x > window_x[-1]
+    return (np.concatenate([x[before], window_x[inner], x[after]]),
+            np.concatenate([y[before], window_y[inner], y[after]]))
@@ -0,0 +1,34 @@
+import hashlib
+import json
+
+import numpy as np
+import pandas as pd
+from plotly.utils import PlotlyJSONEncoder
+
+# digits kept for the plotted values: about what a float32 holds, which is
+# more than a chart can show
+SIGNIFICANT_DIGITS = 7
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+
+def compact_dates(index):
+    # milliseconds since the epoch, which plotly reads on date axes. about a
+    # third of the size of the iso strings, and much faster to encode
+    return (pd.DatetimeIndex(index).asi8 // 10 ** 6).tolist()
+
+def compact_values(values, digits=SIGNIFICANT_DIGITS):
+    # floats written back with their shortest repr once rounded, so
+    # 0.30000000000000004 goes out as 0.3. missing values are null
+    values = np.asarray(values, dtype=np.float64).tolist()
+    text = ('%.{}g '.format(digits) * len(values)) % tuple(values)
+    return [None if v != v else v for v in map(float, text.split())]
+
+def serialize_figure(figure):
+    return json.dumps(figure, cls=PlotlyJSONEncoder,
+                      separators=(',', ':')).encode('utf-8')
+
+def figure_etag(body):
+    return hashlib.sha1(body).hexdigest()
+
+def response_size(response):
+    # (body, etag) pairs, as cached by the builder
+    return len(response[0])
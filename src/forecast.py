@@ -0,0 +1,96 @@
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from metrics import log_event
+from model_cache import model_key
+
+# module level functions, so they can be sent to worker processes
+
+def run_auto_arima(y, **kwargs):
+    # imported on the first fit (pyramid brings statsmodels and scipy with
+    # it), so starting the app doesn't pay for it
+    from pyramid import auto_arima
+    model = auto_arima(
+        y,
+        seasonal=True,
+        trace=False,  # the order found is logged instead
+        error_action='ignore',  # don't want to know if an order does not work
+        suppress_warnings=True,  # don't want convergence warnings
+        stepwise=True,  # set to stepwise
+        **kwargs)
+    log_event('order search', series=getattr(y, 'name', None), params=kwargs,
+              order=getattr(model, 'order', None),
+              seasonal_order=getattr(model, 'seasonal_order', None))
+    return model
+
+def training_frame(monthly):
+    # the series the models are fitted on: the monthly means of the columns
+    # and their total
+    return monthly.assign(total=monthly.sum(axis=1, skipna=False))
+
+def cached_prediction(y, cache, n_periods=12, **kwargs):
+    return cache.get_prediction(model_key(y, kwargs, n_periods))
+
+def forecast(y, n_periods=12, cache=None, registry=None, **kwargs):
+    # fits a model on y and predicts the next n_periods. with a ModelCache,
+    # known (series, parameters) pairs skip the fit. with a ModelRegistry, a
+    # series seen before with fewer observations only refits the order found
+    # then (a single fit instead of a search), see ModelRegistry.update
+    if cache is not None:
+        key = model_key(y, kwargs, n_periods)
+        prediction = cache.get_prediction(key)
+        if prediction is not None:
+            return prediction
+    start = time.time()
+    state = None if registry is None else registry.update(y, kwargs)
+    if state is None:
+        state = dict(model=run_auto_arima(y, **kwargs))
+    model = state['model']
+    log_event('model fit', series=y.name, params=kwargs,
+              searched=not state.get('updates'),
+              seconds=round(time.time() - start, 6),
+              order=getattr(model, 'order', None),
+              seasonal_order=getattr(model, 'seasonal_order', None))
+    prediction = model.predict(n_periods=n_periods)
+    if cache is not None:
+        cache.put(key, model, prediction)
+    if registry is not None:
+        registry.record(y, kwargs, model, prediction,
+                        state.get('updates', 0), state.get('errors'))
+    return prediction
+
+def forecast_tasks(df, n_periods=12, cache=None, registry=None, **kwargs):
+    # one forecast() per column of df, as JobQueue tasks (name -> (function,
+    # args, kwargs)). the columns are fitted in parallel, as many at once as
+    # there are workers
+    return OrderedDict(
+        (c, (forecast, (df[c],),
+             dict(n_periods=n_periods, cache=cache, registry=registry,
+                  **kwargs)))
+        for c in df)
+
+def forecast_frame(predictions, last, freq='M'):
+    # predictions (name -> forecast) of series ending at last, as a frame
+    # with a column per series, indexed by the periods forecast
+    predictions = OrderedDict((name, np.asarray(p))
+                              for name, p in predictions.items())
+    n_periods = max(len(p) for p in predictions.values())
+    index = pd.date_range(last, periods=n_periods + 1, freq=freq)[1:]
+    return pd.DataFrame(predictions, index=index, columns=list(predictions))
+
+def forecast_all(df, n_periods=12, cache=None, registry=None,
+                 max_workers=None, **kwargs):
+    # batch version of forecast(): a model per column of df, fitted on a
+    # process pool, and their forecasts in one frame
+    tasks = forecast_tasks(df, n_periods, cache, registry, **kwargs)
+    with ProcessPoolExecutor(max_workers) as executor:
+        futures = OrderedDict(
+            (name, executor.submit(f, *args, **f_kwargs))
+            for name, (f, args, f_kwargs) in tasks.items())
+        return forecast_frame(
+            OrderedDict((name, f.result()) for name, f in futures.items()),
+            df.index[-1], df.index.freq or 'M')
@@ -0,0 +1,182 @@
+#!/usr/bin/python
+# data of many households, partitioned by household and year:
+#
+#   <BASE_PATH>/households/<household>/<year>.store
+#
+# every partition is a store (see data.write_store), memory mapped when read.
+# aggregations run on the partitions in worker processes, each one reading a
+# partition at a time and sending back its sums and counts, so only the
+# aggregates ever get to the app.
+#   python src/households.py HOUSEHOLD FILE [--dtype float32]
+# adds (or replaces) a household from a file in the format of hourly.csv
+import argparse
+import os
+import shutil
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
+from os import path
+
+import pandas as pd
+
+from data import STORE_DTYPES, STORE_EXT, STORE_META_FILE
+from data import get_file_path, read_store, write_store
+from rollup import parse_rule
+from seasons import season_table, merge_season_tables
+
+HOUSEHOLDS_DIR = 'households'
+# the household selector's value for the sum of all of them
+ALL_HOUSEHOLDS = 'all'
+
+def get_households_path():
+    return get_file_path(HOUSEHOLDS_DIR)
+
+def write_partitions(df, household_path, dtype='float64'):
+    if path.isdir(household_path):
+        shutil.rmtree(household_path)
+    os.makedirs(household_path)
+    for year, part in df.groupby(df.index.year):
+        write_store(part, path.join(household_path,
+                                    '{}{}'.format(year, STORE_EXT)),
+                    dtype=dtype)
+
+def _partition_aggregates(store_path, unit, columns):
+    df = read_store(store_path)
+    if columns is not None:
+        df = df[columns]
+    resampler = df.resample('1{}'.format(unit))
+    return resampler.sum(), resampler.count()
+
+def _partition_season_table(store_path, seasons, columns):
+    return season_table(read_store(store_path), seasons, columns)
+
+def _add(a, b):
+    return a.add(b, fill_value=0)
+
+def _anchor(df, first):
+    # an empty row (sum and count 0) at first, so that a resample starts its
+    # bins there rather than at the first reading of df
+    if not len(df) or df.index[0] <= first:
+        return df
+    return pd.concat([pd.DataFrame(0, index=pd.DatetimeIndex([first]),
+                                   columns=df.columns), df])
+
+def empty_frame(columns=None):
+    return pd.DataFrame(columns=list(columns or []),
+                        index=pd.DatetimeIndex([]), dtype=float)
+
+class Households(object):
+    def __init__(self, root=None, max_workers=None):
+        self.root = root or get_households_path()
+        self.max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_workers)
+        return self._executor
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def ids(self):
+        if not path.isdir(self.root):
+            return []
+        return sorted(h for h in os.listdir(self.root)
+                      if path.isdir(path.join(self.root, h)))
+
+    def partitions(self, household, start=None, end=None):
+        # store paths of the years of household overlapping [start, end]
+        household_path = path.join(self.root, household)
+        years = []
+        for name in os.listdir(household_path):
+            store_path = path.join(household_path, name)
+            if not name.endswith(STORE_EXT) or \
+                    not path.exists(path.join(store_path, STORE_META_FILE)):
+                continue
+            year = int(name[:-len(STORE_EXT)])
+            if (start is None or year >= pd.Timestamp(start).year) and \
+                    (end is None or year <= pd.Timestamp(end).year):
+                years.append((year, store_path))
+        return [p for _, p in sorted(years)]
+
+    def add(self, household, df, dtype='float64'):
+        write_partitions(df, path.join(self.root, household), dtype)
+
+    def load(self, household, start=None, end=None):
+        # all the rows of a household in [start, end], in one frame
+        df = pd.concat([read_store(p)
+                        for p in self.partitions(household, start, end)])
+        return df.loc[start:end]
+
+    def _map(self, f, households, *args, **kwargs):
+        # f(partition, *args) of every partition of households, in the
+        # pool, as household -> [results]
+        futures = OrderedDict(
+            (h, [self.executor.submit(f, p, *args)
+                 for p in self.partitions(h, **kwargs)])
+            for h in households)
+        return OrderedDict((h, [future.result() for future in fs])
+                           for h, fs in futures.items())
+
+    def resample(self, households, rule, columns=None, start=None,
+                 end=None):
+        # household -> its mean by rule. partitions are aggregated by the
+        # unit of the rule (so bins match across partitions) and their sums
+        # and counts added up, then resampled by the whole rule from the day
+        # of the first reading of any of the households (so bins match
+        # across households too)
+        n, unit = parse_rule(rule)
+        aggregates = OrderedDict()
+        results = self._map(_partition_aggregates, households, unit, columns,
+                            start=start, end=end)
+        for h, parts in results.items():
+            if parts:
+                aggregates[h] = (reduce(_add, [s for s, _ in parts]),
+                                 reduce(_add, [c for _, c in parts]))
+        firsts = [sums.index[0] for sums, _ in aggregates.values()
+                  if len(sums)]
+        means = OrderedDict()
+        for h, (sums, counts) in aggregates.items():
+            if n > 1 and firsts:
+                first = min(firsts).floor('D')
+                sums = _anchor(sums, first).resample(rule).sum()
+                counts = _anchor(counts, first).resample(rule).sum()
+            means[h] = (sums / counts).loc[start:end]
+        return means
+
+    def total(self, households, rule, columns=None, start=None, end=None):
+        # sum of the households' means by rule (the ones without readings in
+        # a period count as 0). no rows without any readings at all
+        means = list(self.resample(households, rule, columns, start,
+                                   end).values())
+        return reduce(_add, means) if means else empty_frame(columns)
+
+    def season_table(self, households, seasons, columns=None):
+        # sums by (year, season) of all the households given. partitions
+        # are years, so their tables only need to be put together
+        tables = [t for parts in self._map(_partition_season_table,
+                                           households, seasons,
+                                           columns).values()
+                  for t in parts]
+        if not tables:
+            return None
+        return reduce(lambda a, b: merge_season_tables(a, b, seasons),
+                      tables)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Add a household to the partitioned dataset')
+    parser.add_argument('household')
+    parser.add_argument('file', help='readings in the format of hourly.csv')
+    parser.add_argument('--dtype', choices=STORE_DTYPES, default='float64')
+    args = parser.parse_args(argv)
+    df = pd.read_csv(args.file, parse_dates=['Date_Time'],
+                     infer_datetime_format=True, index_col='Date_Time')
+    Households().add(args.household, df, args.dtype)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+class Job(object):
+    # a group of tasks (name -> (function, args, kwargs)) submitted together.
+    # the job is done when all of them are, and its result is a dict
+    # name -> task result
+    def __init__(self, key, tasks=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.tasks = tasks or OrderedDict()
+        self.futures = OrderedDict()
+        self.created = time.time()
+        self.subscribers = 1
+        self.cancelled = False
+        self.launched = False
+        # futures of the jobs this one replaced, which have to be done
+        # before it's launched, and whether it's still within its delay
+        self.waits = []
+        self.delayed = False
+
+    @property
+    def status(self):
+        if self.cancelled:
+            return CANCELLED
+        if not self.launched:
+            return QUEUED
+        futures = list(self.futures.values())
+        if any(f.done() and f.exception() is not None for f in futures):
+            return FAILED
+        if all(f.done() for f in futures):
+            return DONE
+        if any(f.running() or f.done() for f in futures):
+            return RUNNING
+        return QUEUED
+
+    @property
+    def progress(self):
+        # tasks done, cancelled ones aside
+        return (sum(1 for f in self.futures.values()
+                    if f.done() and not f.cancelled()),
+                max(len(self.futures), len(self.tasks)))
+
+    @property
+    def error(self):
+        for f in self.futures.values():
+            if f.done() and not f.cancelled() and f.exception() is not None:
+                return f.exception()
+
+    @property
+    def results(self):
+        return OrderedDict((name, f.result())
+                           for name, f in self.futures.items())
+
+def finished_job(key, results):
+    # a job whose results are already known (i.e. cached)
+    job = Job(key)
+    for name, result in results.items():
+        job.futures[name] = Future()
+        job.futures[name].set_result(result)
+    job.launched = True
+    return job
+
+class JobQueue(object):
+    # runs jobs on a process pool (created on first use). submitting a key
+    # that's already in flight returns the running job instead of a new one.
+    # a job submitted as the replacement of another one cancels it, and is
+    # only launched once the replaced one's tasks are done (they can't be
+    # stopped once running) and its delay is over, so a burst of submissions
+    # from the same client runs one fit at a time and skips the superseded
+    def __init__(self, max_workers=None, max_jobs=100, metrics=None):
+        self.max_workers = max_workers
+        # finished jobs are kept (for polling) up to this number
+        self.max_jobs = max_jobs
+        # a metrics.Metrics getting the time of every task, from its launch
+        self.metrics = metrics
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._in_flight = dict()
+        self._lock = threading.RLock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(self.max_workers)
+        return self._executor
+
+    def submit(self, key, tasks, replaces=None, delay=0):
+        with self._lock:
+            job = self._jobs.get(self._in_flight.get(key))
+            if job is not None and job.status not in FINISHED:
+                if replaces != job.id:
+                    job.subscribers += 1
+                    self._supersede(replaces)
+                return job.id
+            job = Job(key, OrderedDict(tasks))
+            job.waits = self._supersede(replaces)
+            job.delayed = delay > 0
+            self._add(job)
+        for f in job.waits:
+            f.add_done_callback(lambda f: self._launch(job))
+        if job.delayed:
+            timer = threading.Timer(delay, self._end_delay, (job,))
+            timer.daemon = True
+            timer.start()
+        self._launch(job)
+        return job.id
+
+    def add_finished(self, key, results, replaces=None):
+        job = finished_job(key, results)
+        with self._lock:
+            self._supersede(replaces)
+            self._add(job)
+        return job.id
+
+    def _add(self, job):
+        self._jobs[job.id] = job
+        self._in_flight[job.key] = job.id
+        self._forget_finished()
+
+    def _supersede(self, job_id):
+        # cancels the job replaced and returns what the replacement has to
+        # wait for
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return []
+        self.cancel(job_id)
+        return [f for f in job.waits + list(job.futures.values())
+                if not f.done()]
+
+    def _end_delay(self, job):
+        job.delayed = False
+        self._launch(job)
+
+    def _launch(self, job):
+        with self._lock:
+            if job.launched or job.cancelled or job.delayed or \
+                    any(not f.done() for f in job.waits):
+                return
+            # status is read without the lock: the futures have to be there
+            # before the job is seen as launched
+            job.futures = OrderedDict(
+                (name, self.executor.submit(f, *args, **kwargs))
+                for name, (f, args, kwargs) in job.tasks.items())
+            job.launched = True
+        if self.metrics is not None:
+            for name, f in job.futures.items():
+                f.add_done_callback(partial(self._observe_task, name,
+                                            time.time()))
+
+    def _observe_task(self, name, start, future):
+        if not future.cancelled():
+            self.metrics.observe('job_task_seconds', time.time() - start,
+                                 task=name)
+
+    def _forget_finished(self):
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id].status in FINISHED:
+                del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        # a merged job is only cancelled when all its submitters cancel it.
+        # tasks already running in a worker can't be stopped, their results
+        # are just dropped
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return False
+            job.subscribers -= 1
+            if job.subscribers > 0:
+                return False
+            job.cancelled = True
+            for f in job.futures.values():
+                f.cancel()
+            if self._in_flight.get(job.key) == job.id:
+                del self._in_flight[job.key]
+            return True
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
+import logging
+from functools import partial
+
 import dash
 
-from data import load_data, load_resampled_data_by_month
+from data import load_data, load_resampled_data_by_month, refresh_data
 from builder import AppBuilder
+from households import Households
 
 external_stylesheets = [
     'https://codepen.io/chriddyp/pen/bWLwgP.css',
     'https://cdnjs.cloudflare.com/ajax/libs/bulma/0.7.2/css/bulma.min.css'
 ]
 
-def build():
+def build(env='dev', lean=False, lazy=False):
     app = dash.Dash(__name__, external_stylesheets=external_stylesheets,
                     meta_tags=[
                     {
@@ -18,12 +22,27 @@ def build():
                     },
     ])
     app.config['suppress_callback_exceptions'] = True
-    df = load_data()
+    # json lines from metrics.log_event
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # the frame is the builder's alone, it doesn't need a copy. lean: float32
+    # and no derived columns, see data.lean_frame. lazy: loaded by setup,
+    # i.e. in the background, see AppBuilder.load
+    loader = partial(load_data, lean=lean)
     return AppBuilder(
         app,
-        df,
+        None if lazy else loader(),
         'Task 3.2 - Ubiqum',
-        'Energy consumption')
+        'Energy consumption',
+        env=env,
+        copy_data=False,
+        households=Households(),
+        loader=loader)
+
+def refresh(builder, f):
+    # new readings (same format as full_data.csv) appended to the stores and
+    # to the running app, and the last forecast brought up to date
+    builder.append_data(refresh_data(f))
+    builder.refresh_predictions()
 
 if __name__ == '__main__':
     build().run()
@@ -0,0 +1,107 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import contextmanager
+
+PREFIX = 'electricity_app_'
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5,
+                   10, 30, 60, 300)
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(10))
+
+logger = logging.getLogger('electricity_app')
+
+def log_event(event, **fields):
+    # one json object per line, so the logs can be parsed
+    if logger.isEnabledFor(logging.INFO):
+        fields['event'] = event
+        fields['time'] = round(time.time(), 3)
+        logger.info(json.dumps(fields, default=str, sort_keys=True))
+
+class Histogram(object):
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.
+        self.max = 0.
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        # upper bound of the bucket the quantile falls in
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+class Metrics(object):
+    # histograms by name and labels, rendered in the prometheus text format.
+    # they're per process: under a pre-forking server every worker has its
+    # own, and a scrape gets the one of the worker answering it
+    def __init__(self):
+        self._histograms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        # label values as rendered, so keys sort whatever was passed (i.e.
+        # freq=None and freq='1H' for the same histogram)
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, **labels)
+
+    def summary(self):
+        # (name, labels, count, mean, p95, max) of every histogram
+        with self._lock:
+            items = list(self._histograms.items())
+        return [(name, dict(labels), h.count, h.sum / h.count,
+                 h.quantile(.95), h.max)
+                for (name, labels), h in items if h.count]
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._histograms.items(), key=lambda i: i[0])
+            lines = []
+            typed = set()
+            for (name, labels), h in items:
+                name = PREFIX + name
+                if name not in typed:
+                    typed.add(name)
+                    lines.append('# TYPE {} histogram'.format(name))
+                seen = 0
+                for bound, count in zip(h.buckets + ('+Inf',), h.counts):
+                    seen += count
+                    lines.append('{}_bucket{} {}'.format(
+                        name, _labels(labels + (('le', bound),)), seen))
+                lines.append('{}_sum{} {!r}'.format(name, _labels(labels),
+                                                    h.sum))
+                lines.append('{}_count{} {}'.format(name, _labels(labels),
+                                                    h.count))
+        return '\n'.join(lines) + '\n'
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in labels))
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+from os import path
+
+import numpy as np
+
+# under the user's own cache directory: the files are unpickled, i.e. run,
+# so they can't be somewhere others can write (see _private_dir)
+CACHE_ROOT = path.join(os.environ.get('XDG_CACHE_HOME') or
+                       path.join(path.expanduser('~'), '.cache'),
+                       'electricity_app')
+DEFAULT_CACHE_DIR = path.join(CACHE_ROOT, 'models')
+DEFAULT_REGISTRY_DIR = path.join(CACHE_ROOT, 'registry')
+DEFAULT_MAX_BYTES = 256 * 1024 ** 2
+CACHE_EXT = '.pkl'
+# the forecast of a model, next to it: read without unpickling the model
+PREDICTION_EXT = '.npy'
+
+def series_hash(y):
+    sha = hashlib.sha1()
+    sha.update(np.asarray(y.index.values).view(np.uint8).tobytes()
+               if hasattr(y, 'index') else b'')
+    sha.update(np.ascontiguousarray(y, dtype=np.float64).view(
+        np.uint8).tobytes())
+    return sha.hexdigest()
+
+def model_key(y, params, n_periods):
+    sha = hashlib.sha1()
+    sha.update(series_hash(y).encode())
+    sha.update(repr(sorted(params.items())).encode())
+    sha.update(repr(n_periods).encode())
+    return sha.hexdigest()
+
+def registry_key(name, params):
+    sha = hashlib.sha1()
+    sha.update(repr(name).encode())
+    sha.update(repr(sorted(params.items())).encode())
+    return sha.hexdigest()
+
+def _is_private(st, mask=0o022):
+    # owned by this user, and not writable (with mask) by anyone else
+    owner = st.st_uid == os.getuid() if hasattr(os, 'getuid') else True
+    return owner and not st.st_mode & mask
+
+def _private_dir(dir_path):
+    # dir_path, created if needed with access for this user only, or None if
+    # it isn't ours or others can write to it: anyone who can put a file in
+    # there can run code in the processes loading it
+    try:
+        os.makedirs(dir_path, mode=0o700)
+    except OSError:
+        # there already, or created by another process in the meantime
+        pass
+    try:
+        st = os.lstat(dir_path)
+    except OSError:
+        return None
+    if not stat.S_ISDIR(st.st_mode) or not _is_private(st, 0o077):
+        return None
+    return dir_path
+
+def _load(file_path):
+    # the unpickled file, or None if missing, unreadable or not private
+    if _private_dir(path.dirname(file_path)) is None:
+        return None
+    try:
+        if not _is_private(os.lstat(file_path)):
+            return None
+        with open(file_path, 'rb') as f:
+            return pickle.load(f)
+    except (IOError, OSError, EOFError, pickle.UnpicklingError):
+        return None
+
+def _dump(value, dir_path, file_path):
+    # atomic (rename), so readers in other processes never see half a file.
+    # nothing is written to a directory that isn't private
+    if _private_dir(dir_path) is None:
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, file_path)
+
+def _save_array(values, dir_path, file_path):
+    # like _dump, as a plain .npy (nothing to run when loaded)
+    if _private_dir(dir_path) is None:
+        return
+    fd, tmp_path = tempfile.mkstemp(dir=dir_path, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        np.save(f, np.asarray(values, dtype=np.float64))
+    os.replace(tmp_path, file_path)
+
+def _load_array(file_path):
+    if _private_dir(path.dirname(file_path)) is None:
+        return None
+    try:
+        if not _is_private(os.lstat(file_path)):
+            return None
+        return np.load(file_path, allow_pickle=False)
+    except (IOError, OSError, ValueError):
+        return None
+
+class ModelCache(object):
+    # fitted models and their forecasts pickled in a directory, one file per
+    # key. writes are atomic (rename), so several processes can share the
+    # directory; the least recently used files go when it grows over
+    # max_bytes. only the directory and the budget are pickled with it, so
+    # it can be passed to worker processes. files are only loaded from a
+    # directory, and as files, of this user that nobody else can write.
+    # the forecast of every model is also saved on its own, so reading it
+    # (get_prediction) doesn't load the model
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR,
+                 max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key, ext=CACHE_EXT):
+        return path.join(self.cache_dir, key + ext)
+
+    def get(self, key):
+        entry = _load(self._path(key))
+        if entry is None:
+            return None
+        try:
+            # mtime is the last use, for the eviction
+            os.utime(self._path(key), None)
+        except OSError:
+            pass
+        return entry
+
+    def get_prediction(self, key):
+        prediction_path = self._path(key, PREDICTION_EXT)
+        if not path.exists(prediction_path):
+            # cached before forecasts were saved on their own
+            entry = self.get(key)
+            return None if entry is None else entry['prediction']
+        prediction = _load_array(prediction_path)
+        if prediction is not None:
+            try:
+                os.utime(prediction_path, None)
+            except OSError:
+                pass
+        return prediction
+
+    def has(self, key):
+        # without loading it (get_prediction may still refuse it)
+        return path.isfile(self._path(key, PREDICTION_EXT)) or \
+            path.isfile(self._path(key))
+
+    def put(self, key, model, prediction):
+        # the forecast last: a reader seeing it finds the model too
+        _dump(dict(model=model, prediction=prediction), self.cache_dir,
+              self._path(key))
+        _save_array(prediction, self.cache_dir,
+                    self._path(key, PREDICTION_EXT))
+        self.evict()
+
+    def evict(self):
+        if _private_dir(self.cache_dir) is None:
+            return
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith((CACHE_EXT, PREDICTION_EXT)):
+                continue
+            try:
+                stat = os.stat(path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path.join(self.cache_dir, name))
+            except OSError:
+                pass
+            total -= size
+
+class ModelRegistry(object):
+    # the last model fitted for every (series, parameters), so a series that
+    # only gained a few observations since is refitted with the order already
+    # found instead of searching it again. a search is still done every
+    # search_every updates, or when the last forecast missed the new
+    # observations by more than accuracy_drop times its usual error. like the
+    # cache, it's a private directory (one file per series and parameters)
+    # that can be shared by the processes of this user
+    def __init__(self, registry_dir=DEFAULT_REGISTRY_DIR, search_every=12,
+                 accuracy_drop=1.5):
+        self.registry_dir = registry_dir
+        self.search_every = search_every
+        self.accuracy_drop = accuracy_drop
+
+    def _path(self, name, params):
+        return path.join(self.registry_dir,
+                         registry_key(name, params) + CACHE_EXT)
+
+    def get(self, name, params):
+        return _load(self._path(name, params))
+
+    def update(self, y, params):
+        # the registered model of y refitted on it with the order it has (as a
+        # dict with the model and its history, see record), or None if a
+        # search is due
+        entry = self.get(y.name, params)
+        if entry is None or entry['updates'] >= self.search_every:
+            return None
+        n = entry['observations']
+        # the last observation may have been revised since (i.e. a month
+        # that was still filling up), the ones before can't
+        if len(y) < n or series_hash(y.iloc[:n - 1]) != entry['settled_hash']:
+            return None
+        model = entry['model']
+        if series_hash(y) == entry['series_hash']:
+            return dict(model=model, updates=entry['updates'],
+                        errors=entry['errors'])
+        errors = entry['errors']
+        new = np.asarray(y.iloc[n:], dtype=np.float64)
+        if len(new):
+            predicted = np.asarray(entry['prediction'])[:len(new)]
+            error = float(np.mean(np.abs(predicted - new[:len(predicted)])))
+            if errors and error > self.accuracy_drop * np.mean(errors):
+                return None
+            errors = errors + [error]
+        model.fit(np.asarray(y, dtype=np.float64))
+        return dict(model=model, updates=entry['updates'] + 1,
+                    errors=errors)
+
+    def record(self, y, params, model, prediction, updates=0, errors=None):
+        # a model fitted on all of y: searched (updates=0, no errors yet) or
+        # refitted by update
+        _dump(dict(model=model, prediction=prediction,
+                   observations=len(y), series_hash=series_hash(y),
+                   settled_hash=series_hash(y.iloc[:len(y) - 1]),
+                   updates=updates, errors=errors or []),
+              self.registry_dir, self._path(y.name, params))
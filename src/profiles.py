@@ -0,0 +1,63 @@
+import numpy as np
+
+from seasons import season_codes
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday',
+            'Saturday', 'Sunday']
+HOURS = 24
+
+def profile_cells(index, seasons):
+    # flat position of every timestamp in a (season, weekday, hour) cube
+    codes = season_codes(index, seasons)
+    return (codes * len(WEEKDAYS) + np.asarray(index.dayofweek)) * HOURS + \
+        np.asarray(index.hour)
+
+class ProfileCube(object):
+    # sums and counts of columns by season, weekday and hour of the day, as
+    # (seasons, 7, 24, columns) arrays: a bincount per column over the data
+    # once, then over the new rows only (append). any hour x weekday profile,
+    # of a season or of the whole year, is a division of two of its slices.
+    # rows replaced by newer values are taken out (remove) first
+    def __init__(self, df, seasons, columns=None):
+        self.seasons = seasons
+        self.columns = list(columns if columns is not None else df.columns)
+        shape = (len(seasons), len(WEEKDAYS), HOURS, len(self.columns))
+        self.sums = np.zeros(shape)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.rows = 0
+        self.append(df)
+
+    def append(self, df):
+        self._add(df, 1)
+
+    def remove(self, df):
+        # rows added before, i.e. replaced by newer values
+        self._add(df, -1)
+
+    def _add(self, df, sign):
+        if not len(df):
+            return
+        cells = profile_cells(df.index, self.seasons)
+        n = self.sums[..., 0].size
+        for i, c in enumerate(self.columns):
+            values = np.asarray(df[c].values, dtype=np.float64)
+            valid = ~np.isnan(values)
+            self.sums[..., i] += sign * np.bincount(
+                cells[valid], weights=values[valid],
+                minlength=n).reshape(self.sums.shape[:-1])
+            self.counts[..., i] += sign * np.bincount(
+                cells[valid], minlength=n).reshape(self.counts.shape[:-1])
+        self.rows += sign * len(df)
+
+    def means(self, column, season=None):
+        # (7, 24) means of column by weekday and hour, of a season or of all
+        # of them (NaN where there's no reading)
+        i = self.columns.index(column)
+        sums, counts = self.sums[..., i], self.counts[..., i]
+        if season is None:
+            sums, counts = sums.sum(axis=0), counts.sum(axis=0)
+        else:
+            s = list(self.seasons).index(season)
+            sums, counts = sums[s], counts[s]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(counts > 0, sums / counts, np.nan)
@@ -0,0 +1,112 @@
+import re
+from collections import OrderedDict
+
+import pandas as pd
+
+AGGREGATES = ['sum', 'count', 'min', 'max']
+# how each aggregate is combined when rolling it up to a coarser level
+COMBINE = dict(sum='sum', count='sum', min='min', max='max')
+
+# level -> the finer level it's built from (None for the loaded data). weeks
+# don't nest in months, so months are built from days
+LEVELS = OrderedDict([
+    ('H', None),
+    ('D', 'H'),
+    ('W', 'D'),
+    ('M', 'D'),
+])
+
+# longest bucket of every level, see Rollup.append
+MAX_SPANS = dict(
+    H=pd.Timedelta(hours=1),
+    D=pd.Timedelta(days=1),
+    W=pd.Timedelta(days=7),
+    M=pd.Timedelta(days=31),
+)
+
+RULE_RE = re.compile(r'^\s*(\d*)\s*([A-Za-z]+)\s*$')
+
+def parse_rule(rule):
+    match = RULE_RE.match(str(rule))
+    if match is None:
+        raise ValueError('invalid resample rule: {}'.format(rule))
+    n, unit = match.groups()
+    return int(n or 1), unit
+
+def _bucket_label(timestamp, rule):
+    # label of the bucket of a resample by rule that timestamp falls in
+    return pd.Series([0], index=[timestamp]).resample(rule).sum().index[0]
+
+def _aggregate(df, rule):
+    resampler = df.resample(rule)
+    return dict(sum=resampler.sum(), count=resampler.count(),
+                min=resampler.min(), max=resampler.max())
+
+def _combine(level, rule, aggregates=AGGREGATES):
+    # re-aggregate an already aggregated level: sums and counts add up, min
+    # and max are the min and max of the parts
+    return dict((a, getattr(level[a].resample(rule), COMBINE[a])())
+                for a in aggregates)
+
+class Rollup(object):
+    # multi resolution aggregates (sum, count, min and max per column) of a
+    # time indexed frame. resamples by any multiple of the stored levels are
+    # answered from the matching level instead of the loaded data, so they
+    # cost as much as the output, not the input
+    def __init__(self, df, levels=LEVELS):
+        self._df = df
+        self.columns = list(df)
+        self.parents = levels
+        self.levels = OrderedDict()
+        for unit, parent in levels.items():
+            if parent is None:
+                self.levels[unit] = _aggregate(df, unit)
+            else:
+                self.levels[unit] = _combine(self.levels[parent], unit)
+
+    def append(self, df, data=None):
+        # rows from df.index[0] on are replaced by df (new rows, or the last
+        # ones completed, i.e. a partial hour). every level keeps its buckets
+        # before the one df starts in and only those from there on are
+        # aggregated again, from the rows (or parent buckets) they cover.
+        # data is the whole frame with df in it when the caller already has
+        # it, so there's a single copy of the rows
+        if not len(df):
+            return
+        start = df.index[0]
+        self._df = data if data is not None else pd.concat(
+            [self._df[self._df.index < start], df])
+        # per level: the label of the bucket start falls in
+        firsts = dict()
+        for unit, parent in self.parents.items():
+            at = start if parent is None else firsts[parent]
+            firsts[unit] = _bucket_label(at, unit)
+            # the bucket of `at` starts after at - its longest span, so the
+            # rows from there on cover it and every bucket after it
+            if parent is None:
+                source = self._df[self._df.index > at - MAX_SPANS[unit]]
+                tail = _aggregate(source, unit)
+            else:
+                source = dict((a, v[v.index > at - MAX_SPANS[unit]])
+                              for a, v in self.levels[parent].items())
+                tail = _combine(source, unit)
+            level = self.levels[unit]
+            self.levels[unit] = dict(
+                (a, pd.concat([level[a][level[a].index < firsts[unit]],
+                               tail[a][tail[a].index >= firsts[unit]]]))
+                for a in AGGREGATES)
+
+    def resample(self, rule, how='mean'):
+        n, unit = parse_rule(rule)
+        if unit not in self.levels:
+            # not one of our levels (i.e. minutes), go back to the data
+            return getattr(self._df.resample(rule), how)()
+        level = self.levels[unit]
+        aggregates = ['sum', 'count'] if how == 'mean' else [how]
+        if how != 'mean' and how not in AGGREGATES:
+            raise ValueError('unsupported aggregate: {}'.format(how))
+        if n > 1:
+            level = _combine(level, '{}{}'.format(n, unit), aggregates)
+        if how == 'mean':
+            return level['sum'] / level['count']
+        return level[how].copy()
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+# the season selectors' value for the whole year
+ALL_SEASONS = 'all'
+# the seasons of the app: first and last day, and position in tables and
+# charts
+SEASONS = dict(
+    spring=dict(
+        start=dict(
+            day=20,
+            month=3),
+        end=dict(
+            day=20,
+            month=6),
+        order=1,
+    ),
+    summer=dict(
+        start=dict(
+            day=21,
+            month=6),
+        end=dict(
+            day=21,
+            month=9),
+        order=2,
+    ),
+    fall=dict(
+        start=dict(
+            day=22,
+            month=9),
+        end=dict(
+            day=20,
+            month=12),
+        order=3,
+    ),
+    winter=dict(
+        start=dict(
+            day=21,
+            month=12),
+        end=dict(
+            day=19,
+            month=3),
+        order=4,
+    )
+)
+
+# month * 100 + day, so the boundaries don't move on leap years the way a
+# plain day of the year would
+def _day_key(month, day):
+    return np.asarray(month) * 100 + np.asarray(day)
+
+def _season_masks(seasons, key):
+    masks = []
+    for s in seasons:
+        start = _day_key(seasons[s]['start']['month'],
+                         seasons[s]['start']['day'])
+        end = _day_key(seasons[s]['end']['month'], seasons[s]['end']['day'])
+        if start <= end:
+            masks.append((key >= start) & (key <= end))
+        else:
+            # season wraps the year (i.e. winter, december to march)
+            masks.append((key >= start) | (key <= end))
+    return masks
+
+def season_codes(index, seasons):
+    # position of the season in `seasons` for every timestamp of the index.
+    # when seasons overlap, the first one declared wins
+    key = _day_key(index.month, index.day)
+    codes = np.select(_season_masks(seasons, key),
+                      np.arange(len(seasons)), default=-1)
+    if (codes < 0).any():
+        raise ValueError('{} is not in any season'.format(
+            index[np.argmax(codes < 0)]))
+    return codes
+
+def season_labels(index, seasons):
+    # returns two categoricals aligned with the index: the season ('spring')
+    # and the season with its year ('spring 2007'). categories are sorted by
+    # (year,) season order and only the observed ones are kept
+    names = list(seasons)
+    n = len(names)
+    by_order = sorted(range(n), key=lambda i: seasons[names[i]]['order'])
+    rank = np.empty(n, dtype=np.int64)
+    rank[by_order] = np.arange(n)
+    ranks = rank[season_codes(index, seasons)]
+
+    observed, inverse = np.unique(ranks, return_inverse=True)
+    season = pd.Categorical.from_codes(
+        inverse, categories=[names[by_order[r]] for r in observed])
+
+    keys, inverse = np.unique(np.asarray(index.year) * n + ranks,
+                              return_inverse=True)
+    season_year = pd.Categorical.from_codes(
+        inverse, categories=['{} {}'.format(names[by_order[k % n]], k // n)
+                             for k in keys])
+    return season, season_year
+
+def sort_season_table(table, seasons):
+    # by year, then season order
+    order = [seasons[s]['order'] for s in table.index.get_level_values(1)]
+    return table.iloc[np.lexsort((order, table.index.get_level_values(0)))]
+
+def season_table(df, seasons, columns=None):
+    # sums of the columns by year and season, indexed by (year, season)
+    names = list(seasons)
+    if columns is not None:
+        df = df[columns]
+    codes = season_codes(df.index, seasons)
+    table = df.groupby([np.asarray(df.index.year), codes]).sum()
+    table.index = pd.MultiIndex.from_arrays(
+        [table.index.get_level_values(0),
+         [names[c] for c in table.index.get_level_values(1)]],
+        names=['year', 'season'])
+    return sort_season_table(table, seasons)
+
+def merge_season_tables(table, other, seasons):
+    # the (year, season) in both are added up, i.e. when appending new rows
+    merged = pd.concat([table, other]).groupby(level=[0, 1]).sum()
+    return sort_season_table(merged, seasons)
+
+def season_sums(table, seasons):
+    # sums by season, over all the years
+    sums = table.groupby(level='season').sum()
+    return sums.reindex(sorted(sums.index, key=lambda s: seasons[s]['order']))
@@ -0,0 +1,31 @@
+import pandas as pd
+
+def window_bounds(epochs, start, end):
+    # positions of the rows of [start, end] in sorted epochs (ns)
+    return (epochs.searchsorted(pd.Timestamp(start).value, side='left'),
+            epochs.searchsorted(pd.Timestamp(end).value, side='right'))
+
+class WindowIndex(object):
+    # time range queries over the same data at several resolutions, finest
+    # first (i.e. the loaded data and its hourly, daily... aggregates). a
+    # window is answered by the finest resolution with at most max_rows rows
+    # in it: two binary searches per resolution on its sorted epochs, and a
+    # slice (a view) of its frame, so the cost doesn't depend on the length
+    # of the data
+    def __init__(self, frames):
+        # frames: [(resolution, frame)], finest first
+        self.frames = frames
+        self._epochs = [df.index.asi8 for _, df in frames]
+
+    def count(self, start, end):
+        # rows of the window at every resolution
+        return [(resolution, hi - lo) for (resolution, _), (lo, hi) in zip(
+            self.frames, [window_bounds(e, start, end) for e in self._epochs])]
+
+    def query(self, start, end, max_rows, pad=1):
+        # the resolution used and the rows of the window, plus pad rows on
+        # each side so lines reach the edges of the plot
+        for i, (resolution, df) in enumerate(self.frames):
+            lo, hi = window_bounds(self._epochs[i], start, end)
+            if hi - lo <= max_rows or i == len(self.frames) - 1:
+                return resolution, df.iloc[max(lo - pad, 0):hi + pad]
@@ -0,0 +1,25 @@
+# WSGI entry point for multi-process servers, i.e.
+#
+#   gunicorn --preload --workers 4 --chdir src wsgi:application
+#
+# with --preload this module is imported once, in the master process: the data
+# is loaded and the layout, the callbacks and the resample cache are set up
+# before forking, so every worker shares them copy-on-write (and the memory
+# mapped store, see data.load_data, is shared by all the processes reading it)
+#
+# prediction jobs are per worker: any worker shows a finished forecast (from
+# the shared model cache), only the one running a job its failure, see the
+# README
+#
+# instances started without --preload (i.e. autoscaled ones) can set
+# ELECTRICITY_APP_LAZY=1 instead: the layout is served right away while the
+# data loads in the background, and /ready answers 200 once it's loaded.
+# ELECTRICITY_APP_LEAN=1 loads it as a lean frame (see data.lean_frame)
+import os
+
+from main import build
+
+lazy = os.environ.get('ELECTRICITY_APP_LAZY') == '1'
+lean = os.environ.get('ELECTRICITY_APP_LEAN') == '1'
+builder = build(env='prod', lean=lean, lazy=lazy).setup(background=lazy)
+application = builder.app.server
@@ -0,0 +1,15 @@
+import sys
+from os import path
+
+import pytest
+
+# the modules are imported as the app does, from src
+sys.path.insert(0, path.join(path.dirname(path.abspath(__file__)), '..', 'src'))
+
+import data
+
+@pytest.fixture
+def data_dir(tmpdir, monkeypatch):
+    # an empty data directory in place of BASE_PATH
+    monkeypatch.setattr(data, 'BASE_PATH', str(tmpdir))
+    return str(tmpdir)
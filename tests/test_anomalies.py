@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from anomalies import (AnomalyDetector, HourlyBaseline, SUB_METERING_COLS,
+                       BASELOAD, SPIKE, detect_anomalies, frame_chunks)
+from seasons import SEASONS
+
+def make_readings(periods, freq='T', seed=0):
+    # a daily cycle, noise, and a few spikes and raised baseloads
+    rng = np.random.RandomState(seed)
+    index = pd.date_range('2007-03-01', periods=periods, freq=freq)
+    hours = np.asarray(index.hour)
+    base = 1 + (hours >= 18) * 5.
+    df = pd.DataFrame(
+        base[:, None] + rng.rand(periods, len(SUB_METERING_COLS)),
+        index=index, columns=SUB_METERING_COLS)
+    df.iloc[rng.randint(0, periods, periods // 5000), 0] += 40
+    days = np.asarray(index.normalize().asi8)
+    raised = np.isin(days, np.unique(days)[[20, 35]]) & (hours == 3)
+    df.loc[raised, 'sub_metering_2'] += 10
+    return df
+
+def sorted_anomalies(df):
+    return df.reset_index().sort_values(
+        ['index', 'kind', 'column']).reset_index(drop=True)
+
+@pytest.mark.parametrize('chunksize', [999, 1440, 7777, 50000])
+def test_chunks_match_the_whole_data(chunksize):
+    df = make_readings(60 * 24 * 60)
+    whole = detect_anomalies([df], SEASONS)
+    chunked = detect_anomalies(frame_chunks(df, chunksize), SEASONS)
+    pd.testing.assert_frame_equal(sorted_anomalies(chunked),
+                                  sorted_anomalies(whole))
+    assert (whole.kind == SPIKE).any()
+    raised = whole[(whole.kind == BASELOAD) &
+                   (whole.column == 'sub_metering_2')]
+    assert list(raised.index.hour.unique()) == [3]
+
+def test_out_of_order_chunks_are_rejected():
+    df = make_readings(40 * 24 * 60)
+    detector = AnomalyDetector(SEASONS)
+    detector.update(df.iloc[1000:2000])
+    with pytest.raises(ValueError):
+        detector.update(df.iloc[:1000])
+    with pytest.raises(ValueError):
+        detector.update(df.iloc[1500:2500])
+
+def test_baseline_is_bounded():
+    baseline = HourlyBaseline(SEASONS, ['a'], days=10, min_days=3)
+    index = pd.date_range('2007-01-01', periods=40 * 24, freq='H')
+    minima = pd.DataFrame(dict(a=np.arange(len(index), dtype=float)),
+                          index=index)
+    baseline.score(minima)
+    assert baseline.history.shape == (len(SEASONS), 24, 10, 1)
+    assert baseline.counts.sum() == len(index)
+    # the last 10 days of midnight readings
+    winter = list(SEASONS).index('winter')
+    assert sorted(baseline.history[winter, 0, :, 0]) == \
+        [24. * d for d in range(30, 40)]
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+dash = pytest.importorskip('dash')
+
+from builder import AppBuilder
+from seasons import season_table
+
+COLUMNS = ['global_active_power', 'sub_metering_1', 'sub_metering_2',
+           'sub_metering_3', 'not_sub_metering']
+
+def make_frame(start, periods, seed=0):
+    index = pd.date_range(start, periods=periods, freq='H')
+    return pd.DataFrame(np.random.RandomState(seed).rand(periods,
+                                                         len(COLUMNS)),
+                        index=index, columns=COLUMNS)
+
+def test_append_merges_the_season_table_the_ui_reads():
+    df = make_frame('2007-01-01', 400 * 24)
+    builder = AppBuilder(dash.Dash(__name__), df.iloc[:-30], env='test')
+    builder.season_table('1H')
+    builder.append_data(df.iloc[-31:])
+    rebuilt = []
+    builder._season_table = lambda df: rebuilt.append(df)
+    table = builder.season_table('1H')
+    assert not rebuilt
+    pd.testing.assert_frame_equal(
+        table, season_table(df, builder.seasons, list(builder.feature_cols)))
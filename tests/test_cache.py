@@ -0,0 +1,58 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cache import FrameCache, frame_size
+
+def frame(rows):
+    return pd.DataFrame(dict(a=np.zeros(rows)))
+
+def test_hits_refresh_and_the_oldest_go():
+    size = frame_size(frame(100))
+    cache = FrameCache(max_bytes=2 * size)
+    cache.get('a', lambda: frame(100))
+    cache.get('b', lambda: frame(100))
+    # a is used again, so b is the least recently used
+    assert cache.get('a', lambda: pytest.fail('recomputed')) is not None
+    cache.get('c', lambda: frame(100))
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert cache.nbytes == 2 * size
+
+def test_values_over_the_budget_are_not_kept():
+    cache = FrameCache(max_bytes=frame_size(frame(10)))
+    assert len(cache.get('big', lambda: frame(1000))) == 1000
+    assert 'big' not in cache and cache.nbytes == 0
+
+def test_concurrent_misses_compute_once():
+    cache = FrameCache()
+    calls = []
+    def compute():
+        calls.append(1)
+        time.sleep(.1)
+        return frame(10)
+    threads = [threading.Thread(target=cache.get, args=('k', compute))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+
+def test_failures_are_not_cached():
+    cache = FrameCache()
+    def fail():
+        raise ValueError('no data')
+    with pytest.raises(ValueError):
+        cache.get('k', fail)
+    assert len(cache.get('k', lambda: frame(3))) == 3
+
+def test_peek_and_clear():
+    cache = FrameCache()
+    assert cache.peek('k') is None
+    cache.put('k', frame(3))
+    assert len(cache.peek('k')) == 3
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
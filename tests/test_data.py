@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import data
+
+RAW_COLUMNS = ['Global_active_power', 'Global_reactive_power', 'Voltage',
+               'Global_intensity', 'Sub_metering_1', 'Sub_metering_2',
+               'Sub_metering_3']
+
+def raw_lines(start, periods, seed=0):
+    # readings in the layout of full_data.csv: unpadded day first dates, and
+    # '?' where a reading is missing
+    rng = np.random.RandomState(seed)
+    lines = []
+    for t in pd.date_range(start, periods=periods, freq='T'):
+        values = ['{:.3f}'.format(rng.gamma(2, .6)),
+                  '{:.3f}'.format(rng.gamma(2, .06)),
+                  '{:.2f}'.format(rng.normal(240, 3)),
+                  '{:.1f}'.format(rng.gamma(2, 2.5))] + \
+            ['{:.1f}'.format(rng.poisson(l)) for l in (1, 1.3, 6)]
+        if rng.rand() < .01:
+            values = ['?'] * len(values)
+        lines.append(';'.join(['{}/{}/{}'.format(t.day, t.month, t.year),
+                               t.strftime('%H:%M:%S')] + values))
+    return lines
+
+def write_raw(f, lines):
+    with open(f, 'w') as out:
+        out.write(';'.join(['Date', 'Time'] + RAW_COLUMNS) + '\n')
+        out.write('\n'.join(lines) + '\n')
+
+def test_raw_dates_are_day_first(data_dir):
+    write_raw(data.get_file_path(data.DATA_FILE),
+              raw_lines('2007-01-02', 3))
+    df = data.parse_raw_data()
+    assert list(df.index) == list(pd.date_range('2007-01-02', periods=3,
+                                                freq='T'))
+
+def test_ingest_matches_parse(data_dir):
+    # a chunk a day: every chunk but the first starts on a date that reads
+    # both ways (2/1/2007...), the first one doesn't (31/12/2006)
+    write_raw(data.get_file_path(data.DATA_FILE),
+              raw_lines('2006-12-31', 6 * 1440))
+    parsed = data.parse_raw_data()
+    data.ingest_raw_data(chunksize=1440)
+    ingested = data.read_store(data.get_store_path(data.DATA_FILE))
+    assert parsed.index.is_monotonic_increasing
+    assert parsed.index.equals(ingested.index)
+    # the means filling the NaNs are running sums of the chunks, equal to
+    # the last bits
+    pd.testing.assert_frame_equal(ingested, parsed, check_exact=False)
+
+def test_refresh_completes_the_last_hour(data_dir):
+    # the first file ends within an hour, the second one completes it
+    lines = raw_lines('2007-01-02 10:00', 3 * 60)
+    first, second = data.get_file_path('first.csv'), \
+        data.get_file_path('second.csv')
+    write_raw(data.get_file_path(data.DATA_FILE), lines[:60])
+    write_raw(first, lines[60:90])
+    write_raw(second, lines[90:])
+    data.ingest_raw_data()
+    hourly_path = data.get_file_path(data.PARSED_DATA_FILE)
+    data.parse_raw_data().resample('H').mean().to_csv(hourly_path)
+    data.convert_to_store(data.PARSED_DATA_FILE)
+    data.refresh_data(first)
+    appended = data.refresh_data(second)
+    assert list(appended.index) == list(pd.date_range(
+        '2007-01-02 11:00', periods=2, freq='H'))
+    write_raw(data.get_file_path(data.DATA_FILE), lines)
+    expected = data.parse_raw_data().resample('H').mean()
+    stored = data.read_store(data.get_store_path(data.PARSED_DATA_FILE))
+    pd.testing.assert_frame_equal(stored.reset_index(),
+                                  expected[list(stored)].reset_index(),
+                                  check_exact=False)
+
+def make_frame(periods=1000):
+    index = pd.date_range('2007-01-01', periods=periods, freq='T',
+                          name='Date_Time')
+    rng = np.random.RandomState(0)
+    df = pd.DataFrame(dict(a=rng.rand(periods), b=rng.rand(periods)),
+                      index=index, columns=['a', 'b'])
+    df.iloc[::7, 1] = np.nan
+    return df
+
+@pytest.mark.parametrize('dtype', data.STORE_DTYPES)
+def test_store_round_trip(tmpdir, dtype):
+    df = make_frame()
+    store_path = str(tmpdir.join('hourly' + data.STORE_EXT))
+    data.write_store(df, store_path, dtype=dtype)
+    stored = data.read_store(store_path)
+    assert list(stored.dtypes) == [np.dtype(dtype)] * 2
+    # reset_index: the frequency of the index isn't stored
+    pd.testing.assert_frame_equal(stored.reset_index(),
+                                  df.astype(dtype).reset_index())
+
+def test_lean_frame_keeps_float64_when_float32_would_round(tmpdir):
+    df = make_frame().assign(c=1e9 + np.arange(1000) * 1e-3)
+    lean = data.lean_frame(df)
+    assert list(lean.dtypes) == [np.float32, np.float32, np.float64]
+    store_path = str(tmpdir.join('lean' + data.STORE_EXT))
+    data.write_store(lean, store_path)
+    pd.testing.assert_frame_equal(data.read_store(store_path).reset_index(),
+                                  lean.astype('float64').reset_index())
+
+def test_store_follows_its_source(tmpdir):
+    source = str(tmpdir.join('hourly.csv'))
+    store_path = str(tmpdir.join('hourly' + data.STORE_EXT))
+    make_frame().to_csv(source)
+    data.write_store(make_frame(), store_path, source_path=source)
+    assert data.store_is_fresh(store_path, source)
+    with open(source, 'a') as f:
+        f.write('2007-01-02 00:00:00,1,1\n')
+    assert not data.store_is_fresh(store_path, source)
+
+def test_corrupted_store_is_not_read(tmpdir):
+    store_path = str(tmpdir.join('hourly' + data.STORE_EXT))
+    data.write_store(make_frame(), store_path)
+    np.save(str(tmpdir.join('hourly' + data.STORE_EXT,
+                            data.STORE_INDEX_FILE)), np.arange(10))
+    with pytest.raises(ValueError):
+        data.read_store(store_path)
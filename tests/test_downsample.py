@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from downsample import downsample, lttb, minmax, splice_window
+
+@pytest.fixture
+def trace():
+    rng = np.random.RandomState(0)
+    x = pd.date_range('2007-01-01', periods=10000, freq='T').values
+    y = np.sin(np.arange(10000) / 300.) + rng.rand(10000) * .1
+    y[1234] = 10
+    y[5678] = -10
+    y[rng.randint(0, 10000, 50)] = np.nan
+    return x, y
+
+@pytest.mark.parametrize('method', [lttb, minmax])
+def test_keeps_the_ends_and_the_peaks(trace, method):
+    x, y = trace
+    kept = method(x, y, 500)
+    assert len(kept) <= 502
+    assert (np.diff(kept) > 0).all()
+    assert kept[0] == 0 and kept[-1] == len(y) - 1
+    assert 1234 in kept and 5678 in kept
+
+def test_lttb_keeps_one_point_per_bucket(trace):
+    x, y = trace
+    assert len(lttb(x, y, 500)) == 500
+
+def test_minmax_keeps_the_extremes_of_every_bucket():
+    y = np.array([3., 1., 2., 9., 5., 4., 0., 7.])
+    assert list(minmax(np.arange(8), y, 4)) == [0, 1, 3, 6, 7]
+
+def test_short_traces_are_kept_whole(trace):
+    x, y = trace
+    for method in ['lttb', 'minmax', None]:
+        assert len(downsample(x[:100], y[:100], 500, method)) == 100
+
+def test_lttb_python_and_numpy_buckets_agree(trace, monkeypatch):
+    x, y = trace
+    kept = lttb(x, y, 50)
+    import downsample as module
+    monkeypatch.setattr(module, 'LTTB_PY_BUCKET', 10 ** 6)
+    assert list(lttb(x, y, 50)) == list(kept)
+
+def test_splice_window(trace):
+    x, y = trace
+    overview = lttb(x, y, 100)
+    xs, ys = splice_window(x[overview], y[overview], x[2000:3000],
+                           y[2000:3000], 200)
+    inside = (xs >= x[2000]) & (xs <= x[2999])
+    assert inside.sum() == 200
+    assert (np.diff(xs.astype(np.int64)) > 0).all()
+    assert xs[0] == x[0] and xs[-1] == x[-1]
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+dash = pytest.importorskip('dash')
+
+from builder import AppBuilder
+
+COLUMNS = ['global_active_power', 'sub_metering_1', 'sub_metering_2',
+           'sub_metering_3', 'not_sub_metering']
+
+@pytest.fixture(scope='module')
+def client():
+    index = pd.date_range('2007-01-01', periods=60 * 24, freq='H')
+    df = pd.DataFrame(np.random.RandomState(0).rand(len(index),
+                                                    len(COLUMNS)),
+                      index=index, columns=COLUMNS)
+    app = dash.Dash(__name__)
+    builder = AppBuilder(app, df, env='test')
+    # dash checks there's one on the first request
+    app.layout = builder.build_app_layout()
+    builder.add_figure_route()
+    return app.server.test_client()
+
+@pytest.mark.parametrize('query', [
+    'main', 'main?freq=1D', 'main?freq=2W&household=',
+    'yearly_data_by_season?mode=stack&freq=1M',
+    'profile?column=sub_metering_1&season=winter', 'profile?season=all'])
+def test_figures(client, query):
+    assert client.get('/figures/' + query).status_code == 200
+
+@pytest.mark.parametrize('query', [
+    'main?freq=bogus', 'main?freq=0H', 'main?freq=01D', 'main?freq=5S',
+    'main?freq=100000H', 'main?household=nobody',
+    'all_data_by_season?mode=sideways', 'profile?column=nope',
+    'profile?season=monsoon'])
+def test_bad_parameters_are_rejected(client, query):
+    assert client.get('/figures/' + query).status_code == 400
+
+def test_unknown_view(client):
+    assert client.get('/figures/nope').status_code == 404
@@ -0,0 +1,35 @@
+from os import path
+
+import pandas as pd
+import pytest
+
+from households import Households
+
+@pytest.fixture
+def households(tmpdir):
+    households = Households(str(tmpdir), max_workers=2)
+    # the second one starts a day (and an hour) later
+    for i, h in enumerate(['h1', 'h2']):
+        index = pd.date_range('2007-03-0{} 05:00'.format(1 + i),
+                              periods=60 * 24, freq='H')
+        households.add(h, pd.DataFrame(dict(a=1.), index=index))
+    yield households
+    households.shutdown()
+
+@pytest.mark.parametrize('rule', ['5H', '2D', '3D'])
+def test_bins_match_across_households(households, rule):
+    means = households.resample(['h1', 'h2'], rule)
+    first = means['h1'].index[0]
+    for df in means.values():
+        assert ((df.index - first) % pd.Timedelta(rule) ==
+                pd.Timedelta(0)).all()
+    total = households.total(['h1', 'h2'], rule)
+    assert len(total) == len(means['h1'].index.union(means['h2'].index))
+
+def test_total_without_households(households):
+    total = households.total([], '1D', ['a'])
+    assert list(total.columns) == ['a'] and not len(total)
+    assert isinstance(total.index, pd.DatetimeIndex)
+
+def test_households_under_the_data_directory(data_dir):
+    assert Households().root == path.join(data_dir, 'households')
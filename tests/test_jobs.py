@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+from jobs import JobQueue, CANCELLED, DONE, FINISHED
+
+def wait(queue, job_id, timeout=30):
+    start = time.time()
+    while queue.get(job_id).status not in FINISHED:
+        assert time.time() - start < timeout
+        time.sleep(.01)
+    return queue.get(job_id)
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_workers=1)
+    yield queue
+    queue.shutdown()
+
+def test_same_key_is_one_job(queue):
+    first = queue.submit('k', [('sleep', (time.sleep, (.2,), {}))])
+    assert queue.submit('k', [('sleep', (time.sleep, (.2,), {}))]) == first
+    assert wait(queue, first).results == dict(sleep=None)
+
+def test_replacement_cancels_and_waits(queue):
+    first = queue.submit('a', [('sleep', (time.sleep, (.3,), {}))])
+    second = queue.submit('b', [('abs', (abs, (-2,), {}))], replaces=first)
+    assert queue.get(first).status == CANCELLED
+    job = wait(queue, second)
+    assert job.status == DONE and job.results == dict(abs=2)
+
+def test_delayed_replacements_skip_the_superseded(queue):
+    first = queue.submit('a', [('abs', (abs, (-1,), {}))], delay=.2)
+    second = queue.submit('b', [('abs', (abs, (-2,), {}))], replaces=first,
+                          delay=.2)
+    assert queue.get(first).status == CANCELLED
+    assert not queue.get(first).futures
+    assert wait(queue, second).results == dict(abs=2)
+
+def test_cancel_once_every_subscriber_did(queue):
+    first = queue.submit('k', [('sleep', (time.sleep, (.3,), {}))])
+    queue.submit('k', [('sleep', (time.sleep, (.3,), {}))])
+    assert not queue.cancel(first)
+    assert queue.get(first).status != CANCELLED
+    assert queue.cancel(first)
+    assert queue.get(first).status == CANCELLED
+    # the key is free again
+    assert queue.submit('k', [('abs', (abs, (-1,), {}))]) != first
+
+def test_cancelled_tasks_are_not_progress(queue):
+    job_id = queue.submit('k', [(name, (time.sleep, (.2,), {}))
+                                for name in 'abc'])
+    time.sleep(.1)
+    assert queue.cancel(job_id)
+    job = queue.get(job_id)
+    # the ones already sent to the pool can't be stopped, the others never
+    # run
+    while not all(f.done() for f in job.futures.values()):
+        time.sleep(.01)
+    cancelled = sum(1 for f in job.futures.values() if f.cancelled())
+    assert cancelled and job.progress == (3 - cancelled, 3)
@@ -0,0 +1,41 @@
+import pytest
+
+from metrics import Metrics, PREFIX
+
+@pytest.fixture
+def metrics():
+    metrics = Metrics()
+    for value in [.002, .02, .2]:
+        metrics.observe('groupby_seconds', value, freq='1H')
+    metrics.observe('groupby_seconds', .02, freq=None)
+    metrics.observe('figure_bytes', 5000, buckets=(1024, 4096, 16384),
+                    view='main')
+    return metrics
+
+def test_render(metrics):
+    lines = metrics.render().splitlines()
+    name = PREFIX + 'groupby_seconds'
+    assert lines.count('# TYPE {} histogram'.format(name)) == 1
+    assert '{}_count{{freq="1H"}} 3'.format(name) in lines
+    assert '{}_count{{freq="None"}} 1'.format(name) in lines
+    assert '{}_bucket{{freq="1H",le="0.025"}} 2'.format(name) in lines
+    assert '{}_bucket{{freq="1H",le="+Inf"}} 3'.format(name) in lines
+    assert '{}figure_bytes_bucket{{view="main",le="4096"}} 0'.format(
+        PREFIX) in lines
+    assert '{}figure_bytes_bucket{{view="main",le="16384"}} 1'.format(
+        PREFIX) in lines
+
+def test_summary(metrics):
+    rows = dict(((name, tuple(sorted(labels.items()))), rest)
+                for name, labels, *rest in metrics.summary())
+    count, mean, p95, top = rows[('groupby_seconds', (('freq', '1H'),))]
+    assert count == 3 and mean == pytest.approx(.074)
+    assert p95 == .25 and top == .2
+    assert rows[('figure_bytes', (('view', 'main'),))][0] == 1
+
+def test_timer(metrics):
+    with metrics.timer('fit_seconds', model='arima'):
+        pass
+    assert [row[:3] for row in metrics.summary()
+            if row[0] == 'fit_seconds'] == [('fit_seconds',
+                                             dict(model='arima'), 1)]
@@ -0,0 +1,93 @@
+import os
+import pickle
+from os import path
+
+import pandas as pd
+import pytest
+
+from model_cache import ModelCache, ModelRegistry
+
+@pytest.fixture
+def cache(tmpdir):
+    return ModelCache(path.join(str(tmpdir), 'models'))
+
+def test_put_and_get(cache):
+    cache.put('key', 'model', [1., 2.])
+    assert cache.get('key') == dict(model='model', prediction=[1., 2.])
+    assert os.stat(cache.cache_dir).st_mode & 0o777 == 0o700
+
+def test_not_loaded_from_a_shared_directory(cache):
+    cache.put('key', 'model', [1.])
+    os.chmod(cache.cache_dir, 0o777)
+    assert cache.get('key') is None
+
+def test_files_writable_by_others_are_not_loaded(cache):
+    cache.put('key', 'model', [1.])
+    planted = path.join(cache.cache_dir, 'planted.pkl')
+    with open(planted, 'wb') as f:
+        pickle.dump(dict(model='other', prediction=[]), f)
+    os.chmod(planted, 0o666)
+    assert cache.get('planted') is None
+    assert cache.get('key') is not None
+
+def test_registry_not_loaded_from_a_shared_directory(tmpdir):
+    registry = ModelRegistry(path.join(str(tmpdir), 'registry'))
+    y = pd.Series([1., 2., 3.], name='total')
+    registry.record(y, dict(m=1), 'model', [4.])
+    assert registry.get('total', dict(m=1))['model'] == 'model'
+    os.chmod(registry.registry_dir, 0o777)
+    assert registry.get('total', dict(m=1)) is None
+
+class Model(object):
+    # stands for a fitted arima: remembers what it was refitted on
+    def __init__(self):
+        self.fitted = None
+
+    def fit(self, y):
+        self.fitted = len(y)
+
+@pytest.fixture
+def registry(tmpdir):
+    return ModelRegistry(path.join(str(tmpdir), 'registry'), search_every=3,
+                         accuracy_drop=1.5)
+
+def series(values):
+    return pd.Series(values, name='total',
+                     index=pd.date_range('2007-01-31', periods=len(values),
+                                         freq='M'))
+
+def test_registry_refits_the_order_found(registry):
+    assert registry.update(series([1., 2.]), dict(m=1)) is None
+    y = series([1., 2., 3.])
+    registry.record(y, dict(m=1), Model(), [4., 5.])
+    # the same series: the model as is
+    assert registry.update(y, dict(m=1))['updates'] == 0
+    state = registry.update(series([1., 2., 3., 4.5]), dict(m=1))
+    assert state['model'].fitted == 4
+    assert state['updates'] == 1 and state['errors'] == [.5]
+
+def test_registry_searches_again_on_schedule(registry):
+    y = series([1., 2., 3.])
+    registry.record(y, dict(m=1), Model(), [4.], updates=3)
+    assert registry.update(series([1., 2., 3., 4.]), dict(m=1)) is None
+
+def test_registry_searches_again_when_accuracy_drops(registry):
+    y = series([1., 2., 3.])
+    registry.record(y, dict(m=1), Model(), [4.], updates=1, errors=[1.])
+    assert registry.update(series([1., 2., 3., 5.4]), dict(m=1)) is not None
+    assert registry.update(series([1., 2., 3., 5.6]), dict(m=1)) is None
+
+def test_registry_follows_revisions(registry):
+    registry.record(series([1., 2., 3.]), dict(m=1), Model(), [4.])
+    # the last month was still filling up, the ones before were settled
+    assert registry.update(series([1., 2., 3.5, 4.]), dict(m=1)) is not None
+    assert registry.update(series([1., 2.5, 3., 4.]), dict(m=1)) is None
+
+def test_prediction_read_without_the_model(cache):
+    cache.put('key', 'model', [1., 2.])
+    # a model that can't be unpickled any more, i.e. from another version
+    with open(cache._path('key'), 'wb') as f:
+        f.write(b'not a pickle')
+    assert list(cache.get_prediction('key')) == [1., 2.]
+    assert cache.get('key') is None
+    assert cache.get_prediction('other') is None
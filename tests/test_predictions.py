@@ -0,0 +1,51 @@
+from os import path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+dash = pytest.importorskip('dash')
+
+from builder import AppBuilder
+from jobs import DONE
+from model_cache import model_key
+
+COLUMNS = ['global_active_power', 'sub_metering_1', 'sub_metering_2',
+           'sub_metering_3', 'not_sub_metering']
+PARAMS = dict(m=12)
+
+def make_builder(tmpdir):
+    index = pd.date_range('2007-01-01', periods=3 * 365 * 24, freq='H')
+    df = pd.DataFrame(np.random.RandomState(0).rand(len(index),
+                                                    len(COLUMNS)),
+                      index=index, columns=COLUMNS)
+    return AppBuilder(dash.Dash(__name__), df, env='test',
+                      model_cache_dir=path.join(str(tmpdir), 'models'),
+                      model_registry_dir=path.join(str(tmpdir), 'registry'))
+
+def cache_models(builder, columns):
+    df = builder.training_frame()
+    for c in columns:
+        builder.model_cache.put(
+            model_key(df[c], PARAMS, builder.prediction_periods), 'model',
+            [float(len(c))] * builder.prediction_periods)
+
+def test_job_shown_by_another_worker(tmpdir):
+    # a forking server: the poll reaches a worker without the job
+    worker, other = make_builder(tmpdir), make_builder(tmpdir)
+    columns = list(worker.prediction_cols)
+    cache_models(worker, columns)
+    job = worker.submit_prediction(PARAMS)
+    assert worker.prediction_job(job).status == DONE
+    found = other.prediction_job(job)
+    assert found.status == DONE
+    assert list(found.results) == columns
+    assert found.results[columns[0]][0] == len(columns[0])
+
+def test_job_not_finished_elsewhere(tmpdir):
+    worker, other = make_builder(tmpdir), make_builder(tmpdir)
+    cache_models(worker, list(worker.prediction_cols)[:-1])
+    df = worker.training_frame()[list(worker.prediction_cols)]
+    job = ' '.join(['0' * 32] + [model_key(df[c], PARAMS, 12) for c in df])
+    assert other.prediction_job(job) is None
+    assert other.prediction_job(None) is None
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from profiles import ProfileCube, WEEKDAYS, HOURS
+from seasons import SEASONS, season_labels
+
+def make_frame(start, periods, seed=0):
+    rng = np.random.RandomState(seed)
+    index = pd.date_range(start, periods=periods, freq='H')
+    df = pd.DataFrame(dict(a=rng.rand(periods), b=rng.rand(periods)),
+                      index=index)
+    df.iloc[rng.randint(0, periods, periods // 20), 1] = np.nan
+    return df
+
+def groupby_means(df, column, season=None):
+    if season is not None:
+        df = df[np.asarray(season_labels(df.index, SEASONS)[0]) == season]
+    means = df[column].groupby([df.index.dayofweek, df.index.hour]).mean()
+    return means.reindex(pd.MultiIndex.from_product(
+        [range(len(WEEKDAYS)), range(HOURS)])).values.reshape(
+            len(WEEKDAYS), HOURS)
+
+def assert_same_cube(cube, df):
+    for column in ['a', 'b']:
+        for season in [None] + list(SEASONS):
+            np.testing.assert_allclose(cube.means(column, season),
+                                       groupby_means(df, column, season))
+
+def test_means_match_a_groupby():
+    df = make_frame('2007-01-01', 400 * 24)
+    assert_same_cube(ProfileCube(df, SEASONS), df)
+
+def test_append_and_remove_match_a_rebuild():
+    df = make_frame('2007-01-01', 400 * 24)
+    cube = ProfileCube(df.iloc[:-100], SEASONS)
+    # the last 10 rows loaded are replaced by other values
+    cube.remove(df.iloc[-110:-100])
+    cube.append(pd.concat([df.iloc[-110:-100] * 2, df.iloc[-100:]]))
+    expected = pd.concat([df.iloc[:-110], df.iloc[-110:-100] * 2,
+                          df.iloc[-100:]])
+    assert_same_cube(cube, expected)
+    assert cube.rows == len(df)
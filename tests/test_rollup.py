@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from rollup import AGGREGATES, Rollup
+
+def make_frame(start, periods, freq='T', seed=0):
+    rng = np.random.RandomState(seed)
+    index = pd.date_range(start, periods=periods, freq=freq)
+    df = pd.DataFrame(rng.rand(periods, 2), index=index, columns=['a', 'b'])
+    df.iloc[rng.randint(0, periods, periods // 50), 0] = np.nan
+    return df
+
+def assert_same_levels(rollup, expected):
+    for unit in expected.levels:
+        for a in AGGREGATES:
+            pd.testing.assert_frame_equal(rollup.levels[unit][a],
+                                          expected.levels[unit][a])
+
+@pytest.mark.parametrize('rule', ['1H', '6H', '1D', '3D', '1W', '1M'])
+def test_resample_matches_pandas(rule):
+    df = make_frame('2007-01-01 00:07', 90 * 24 * 60)
+    # reset_index: the frequency of the index isn't compared
+    pd.testing.assert_frame_equal(Rollup(df).resample(rule).reset_index(),
+                                  df.resample(rule).mean().reset_index())
+
+def test_append_matches_rebuild():
+    # split within an hour, a day, a week and a month
+    df = make_frame('2007-01-01 00:07', 70 * 24 * 60)
+    rollup = Rollup(df.iloc[:40000])
+    for stop in [41234, 60000, 100000, len(df)]:
+        rollup.append(df.iloc[rollup._df.shape[0]:stop])
+        assert_same_levels(rollup, Rollup(df.iloc[:stop]))
+
+def test_append_replaces_the_rows_it_overlaps():
+    # the last hour of the first frame is partial, then completed
+    df = make_frame('2007-01-30 00:00', 5 * 24, freq='H')
+    rollup = Rollup(df.iloc[:-10])
+    partial = df.iloc[-11:-10] * 3
+    rollup.append(partial)
+    rollup.append(df.iloc[-11:])
+    assert_same_levels(rollup, Rollup(df))
+
+def test_append_uses_the_callers_frame():
+    df = make_frame('2007-01-01 00:00', 3 * 24 * 60)
+    rollup = Rollup(df.iloc[:2000])
+    rollup.append(df.iloc[2000:], df)
+    assert rollup._df is df
+    assert_same_levels(rollup, Rollup(df))
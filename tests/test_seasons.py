@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from seasons import SEASONS, season_codes, season_labels, season_table
+
+def test_boundaries():
+    index = pd.DatetimeIndex(['2007-03-19 23:00', '2007-03-20', '2007-06-20',
+                              '2007-06-21', '2007-09-22', '2007-12-20',
+                              '2007-12-21', '2008-01-01'])
+    season, _ = season_labels(index, SEASONS)
+    assert list(season) == ['winter', 'spring', 'spring', 'summer', 'fall',
+                            'fall', 'winter', 'winter']
+
+def test_leap_years_keep_the_boundaries():
+    index = pd.DatetimeIndex(['2008-02-29', '2008-03-20', '2008-06-21'])
+    season, _ = season_labels(index, SEASONS)
+    assert list(season) == ['winter', 'spring', 'summer']
+
+def test_labels_are_ordered_and_observed():
+    index = pd.date_range('2006-12-16', '2008-01-10', freq='D')
+    season, season_year = season_labels(index, SEASONS)
+    assert list(season.categories) == ['spring', 'summer', 'fall', 'winter']
+    # by calendar year: january to march and december of 2007 are both
+    # winter 2007
+    assert list(season_year.categories) == [
+        'fall 2006', 'winter 2006', 'spring 2007', 'summer 2007',
+        'fall 2007', 'winter 2007', 'winter 2008']
+    assert season_year[0] == 'fall 2006'
+    assert season_year[40] == 'winter 2007'
+
+def test_uncovered_days_are_an_error():
+    seasons = dict(SEASONS, spring=dict(SEASONS['spring'],
+                                        start=dict(day=25, month=3)))
+    with pytest.raises(ValueError):
+        season_codes(pd.DatetimeIndex(['2007-03-22']), seasons)
+
+def test_table_sums_by_year_and_season():
+    index = pd.date_range('2007-01-01', '2007-12-31', freq='D')
+    df = pd.DataFrame(dict(a=np.ones(len(index))), index=index)
+    table = season_table(df, SEASONS)
+    assert list(table.index) == [(2007, 'spring'), (2007, 'summer'),
+                                 (2007, 'fall'), (2007, 'winter')]
+    assert table.a.sum() == len(index)
+    assert table.loc[(2007, 'summer'), 'a'] == 93
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from window import WindowIndex
+
+@pytest.fixture
+def index():
+    minutes = pd.DataFrame(
+        dict(a=np.arange(30 * 24 * 60, dtype=float)),
+        index=pd.date_range('2007-01-01', periods=30 * 24 * 60, freq='T'))
+    return WindowIndex([(None, minutes), ('1H', minutes.resample('1H').mean()),
+                        ('1D', minutes.resample('1D').mean())])
+
+def test_finest_resolution_that_fits(index):
+    resolution, df = index.query('2007-01-02', '2007-01-02 01:00', 1000)
+    assert resolution is None
+    # the hour and a row on each side
+    assert len(df) == 61 + 2
+    assert df.index[1] == pd.Timestamp('2007-01-02')
+    resolution, df = index.query('2007-01-02', '2007-01-10', 1000)
+    assert resolution == '1H' and len(df) == 8 * 24 + 1 + 2
+
+def test_coarsest_resolution_when_nothing_fits(index):
+    resolution, df = index.query('2007-01-01', '2007-01-30', 10)
+    assert resolution == '1D' and len(df) == 30
+
+def test_edges_of_the_data(index):
+    _, df = index.query('2006-12-31 23:50', '2007-01-01 00:05', 100, pad=3)
+    assert df.index[0] == pd.Timestamp('2007-01-01') and len(df) == 9
+    assert index.count('2007-01-01', '2007-01-01 23:59') == [
+        (None, 24 * 60), ('1H', 24), ('1D', 1)]